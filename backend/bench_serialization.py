@@ -0,0 +1,55 @@
+# bench_serialization.py
+"""
+Compare response serialization for /predict and /model-info:
+the previous path (jsonable_encoder + stdlib json) against FastJSONResponse
+and the compact payload. Needs a trained all_models.pkl.
+
+    python bench_serialization.py
+"""
+import asyncio
+import logging
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import main
+
+
+def run_coroutine(coro):
+    """Drive a coroutine that never awaits, without event-loop overhead"""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("coroutine suspended")
+
+
+def per_call_us(fn, number=2000):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+if __name__ == "__main__":
+    asyncio.run(main.load_models())
+    if main.models_dict is None:
+        raise SystemExit(f"❌ {main.model_load_error}")
+    main.logger.setLevel(logging.ERROR)
+
+    farmer_input = main.FarmerInput(
+        soil_type="Loamy", season="Kharif", state="Karnataka", district="Belgaum", market="Kudchi"
+    )
+    result = main.recommend_crops_api(farmer_input)
+    compact = main.select_fields(result, compact=True)
+    info = main.build_model_info()
+
+    cases = [
+        ("/predict  stdlib (previous)", lambda: JSONResponse(jsonable_encoder(result)).body),
+        (f"/predict  {main.FastJSONResponse.__name__}", lambda: main.FastJSONResponse(result).body),
+        (f"/predict  {main.FastJSONResponse.__name__} compact", lambda: main.FastJSONResponse(compact).body),
+        ("/model-info stdlib (previous)", lambda: JSONResponse(jsonable_encoder(main.build_model_info())).body),
+        ("/model-info cached body", lambda: run_coroutine(main.model_info()).body),
+    ]
+
+    print(f"{'case':<40} {'µs/call':>10} {'bytes':>8}")
+    for name, fn in cases:
+        print(f"{name:<40} {per_call_us(fn):>10.1f} {len(fn()):>8}")
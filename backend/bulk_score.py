@@ -0,0 +1,51 @@
+# bulk_score.py
+"""
+Score a CSV of farmer rows (soil_type, season, state, district, market)
+offline, streaming NDJSON or CSV results as each chunk finishes.
+
+    python bulk_score.py farmers.csv -o results.ndjson
+    python bulk_score.py farmers.csv --format csv --chunk-size 1000 > results.csv
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+import main
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk crop recommendations for a CSV of farmer rows")
+    parser.add_argument("input", help="CSV with soil_type, season, state, district, market columns")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--chunk-size", type=int, default=main.BULK_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    # Same model and location setup as the API
+    asyncio.run(main.load_models())
+    asyncio.run(main.load_price_index())
+    if main.models_dict is None:
+        sys.exit(f"❌ {main.model_load_error}")
+    main.logger.setLevel(logging.ERROR)
+
+    job = main.new_bulk_job(args.input)
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        with open(args.input, "rb") as lines:
+            try:
+                rows = main.open_bulk_reader(lines)
+            except ValueError as e:
+                sys.exit(f"❌ {e}")
+            for block in main.stream_bulk_scores(rows, args.format, args.chunk_size, job):
+                out.write(block)
+                print(f"\r⏳ {job['rows_processed']} rows ({job['rows_failed']} failed)",
+                      end="", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = job["finished_at"] - job["started_at"]
+    print(f"\n✅ {job['status']}: {job['rows_ok']} ok, {job['rows_failed']} failed in {elapsed:.2f}s",
+          file=sys.stderr)
+    sys.exit(0 if job["status"] == "completed" else 1)
@@ -0,0 +1,209 @@
+# compact_trees.py
+import numpy as np
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import (
+    GradientBoostingRegressor,
+    RandomForestClassifier,
+    RandomForestRegressor,
+    VotingRegressor,
+)
+
+
+def _narrowest_uint(max_value):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+def _threshold_float32(threshold):
+    """
+    float32 thresholds that split float32 inputs exactly like the float64
+    originals: round toward -inf, so x <= t32 iff x <= t64 for any float32 x.
+    """
+    t32 = threshold.astype(np.float32)
+    over = t32.astype(np.float64) > threshold
+    t32[over] = np.nextafter(t32[over], np.float32(-np.inf))
+    return t32
+
+
+class PackedTrees:
+    """
+    Several fitted sklearn trees flattened into shared arrays.
+
+    Stored (pickled) form uses per-tree uint8/uint16 child indices, a uint8
+    feature index and float32 thresholds; leaves are marked by a zero left
+    child, since no node points back at its tree's root. Runtime arrays
+    with global int32 indices are rebuilt on unpickling.
+    """
+
+    def __init__(self, trees):
+        counts = np.array([t.node_count for t in trees], dtype=np.int64)
+        index_dtype = _narrowest_uint(counts.max())
+        left = np.concatenate([t.children_left for t in trees])
+        right = np.concatenate([t.children_right for t in trees])
+        leaf = left == -1
+
+        self._state = {
+            'node_counts': counts.astype(np.uint32),
+            'left': np.where(leaf, 0, left).astype(index_dtype),
+            'right': np.where(leaf, 0, right).astype(index_dtype),
+            'feature': np.where(leaf, 0, np.concatenate([t.feature for t in trees])).astype(np.uint8),
+            'threshold': np.where(leaf, 0, _threshold_float32(np.concatenate([t.threshold for t in trees]))).astype(np.float32),
+            'max_depth': int(max(t.max_depth for t in trees)),
+        }
+        self._build_runtime()
+
+    def __getstate__(self):
+        return self._state
+
+    def __setstate__(self, state):
+        self._state = state
+        self._build_runtime()
+
+    def _build_runtime(self):
+        s = self._state
+        counts = s['node_counts'].astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        node_offset = np.repeat(offsets, counts)
+        is_leaf = s['left'] == 0
+
+        self.n_trees = len(counts)
+        self.roots = offsets.astype(np.int32)
+        self.is_leaf = is_leaf
+
+        # Child table indexed by node * 2 + (x <= threshold); leaves loop back to
+        # themselves so every (row, tree) pair can take the same number of steps
+        left = s['left'].astype(np.int64) + node_offset
+        right = s['right'].astype(np.int64) + node_offset
+        own = np.arange(len(is_leaf))
+        self.children = np.column_stack([
+            np.where(is_leaf, own, right), np.where(is_leaf, own, left)
+        ]).astype(np.int32).ravel()
+        self.feature = s['feature'].astype(np.int32)
+        self.threshold = s['threshold']
+        self.max_depth = s['max_depth']
+
+    def apply(self, X):
+        """Global leaf index per (row, tree)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        flat = X.ravel()
+        node = np.tile(self.roots, len(X))
+        row_base = np.repeat(np.arange(len(X), dtype=np.int32) * X.shape[1], self.n_trees)
+        for depth in range(self.max_depth):
+            go_left = flat[row_base + self.feature[node]] <= self.threshold[node]
+            node = self.children[node * 2 + go_left]
+            if depth % 4 == 3 and self.is_leaf[node].all():
+                break
+        return node.reshape(len(X), self.n_trees)
+
+    @property
+    def nbytes(self):
+        return sum(v.nbytes for v in self._state.values() if isinstance(v, np.ndarray))
+
+
+class CompactForestClassifier:
+    """
+    RandomForestClassifier.predict_proba over PackedTrees. Leaf class
+    distributions are stored sparsely (class id + float16 probability).
+    """
+
+    def __init__(self, forest: RandomForestClassifier):
+        trees = [e.tree_ for e in forest.estimators_]
+        self.trees = PackedTrees(trees)
+        self.classes_ = forest.classes_
+        self.n_features_in_ = forest.n_features_in_
+
+        values = np.concatenate([t.value[:, 0, :] for t in trees])
+        values = values / np.maximum(values.sum(axis=1, keepdims=True), 1e-12)
+        values[~self.trees.is_leaf] = 0
+        nodes, classes = np.nonzero(values)
+        counts = np.bincount(nodes, minlength=len(values))
+        self.leaf_counts = counts.astype(_narrowest_uint(counts.max()))
+        self.leaf_classes = classes.astype(_narrowest_uint(len(self.classes_) - 1))
+        self.leaf_probs = values[nodes, classes].astype(np.float16)
+        self._build_runtime()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_leaf_ptr']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_runtime()
+
+    def _build_runtime(self):
+        self._leaf_ptr = np.concatenate([[0], np.cumsum(self.leaf_counts[:-1], dtype=np.int64)])
+
+    def predict_proba(self, X):
+        leaves = self.trees.apply(X).ravel()
+        n_rows, n_classes = len(X), len(self.classes_)
+        counts = self.leaf_counts[leaves].astype(np.int64)
+        starts = self._leaf_ptr[leaves]
+
+        # Expand every (row, tree) leaf into its stored entries
+        entry_start = np.repeat(starts - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+        entries = entry_start + np.arange(counts.sum())
+        rows = np.repeat(np.repeat(np.arange(n_rows), self.trees.n_trees), counts)
+
+        flat = np.bincount(rows * n_classes + self.leaf_classes[entries],
+                           weights=self.leaf_probs[entries].astype(np.float64),
+                           minlength=n_rows * n_classes)
+        return flat.reshape(n_rows, n_classes) / self.trees.n_trees
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    @property
+    def nbytes(self):
+        return self.trees.nbytes + self.leaf_counts.nbytes + self.leaf_classes.nbytes + self.leaf_probs.nbytes
+
+
+class CompactTreeRegressor:
+    """offset + scale * sum of float32 leaf values: a random forest (mean) or gradient boosting (stages)"""
+
+    def __init__(self, trees, scale, offset=0.0):
+        self.trees = PackedTrees(trees)
+        values = np.concatenate([t.value[:, 0, 0] for t in trees]).astype(np.float32)
+        values[~self.trees.is_leaf] = 0
+        self.values = values
+        self.scale = float(scale)
+        self.offset = float(offset)
+
+    def predict(self, X):
+        leaves = self.trees.apply(X)
+        return self.offset + self.scale * self.values[leaves].sum(axis=1, dtype=np.float64)
+
+    @property
+    def nbytes(self):
+        return self.trees.nbytes + self.values.nbytes
+
+
+class CompactVotingRegressor:
+    """Weighted mean of compacted (or untouched linear) members, like VotingRegressor.predict"""
+
+    def __init__(self, members, weights=None):
+        self.estimators_ = members
+        self.weights = weights
+
+    def predict(self, X):
+        predictions = np.column_stack([m.predict(X) for m in self.estimators_])
+        return np.average(predictions, axis=1, weights=self.weights)
+
+
+def compact_model(model):
+    """Compact counterpart of a fitted model; models without trees are returned as-is"""
+    if isinstance(model, RandomForestClassifier):
+        return CompactForestClassifier(model)
+    if isinstance(model, RandomForestRegressor):
+        trees = [e.tree_ for e in model.estimators_]
+        return CompactTreeRegressor(trees, scale=1.0 / len(trees))
+    if isinstance(model, GradientBoostingRegressor):
+        if not isinstance(model.init_, DummyRegressor):
+            raise TypeError(f"Unsupported GradientBoostingRegressor init: {model.init_!r}")
+        return CompactTreeRegressor([e.tree_ for e in model.estimators_[:, 0]], scale=model.learning_rate,
+                                    offset=float(np.ravel(model.init_.constant_)[0]))
+    if isinstance(model, VotingRegressor):
+        return CompactVotingRegressor([compact_model(m) for m in model.estimators_], model.weights)
+    return model
@@ -0,0 +1,190 @@
+# export_recommendations.py
+"""
+Precompute /predict results for every soil type x season x known
+(state, district, market) and write them as a static, per-state bundle
+that a CDN or edge function can serve without the model.
+
+    python export_recommendations.py --out recommendations_export
+    python export_recommendations.py --full        # ignore the previous manifest
+
+Layout:
+    <out>/manifest.json
+    <out>/states/<state-slug>.<fingerprint>.json.gz
+
+A shard's fingerprint covers everything its results depend on (suitability
+probabilities for the preset environments, the prices for its markets and
+the scoring weights), so re-running only rewrites states whose inputs changed.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import re
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+import main
+from location_index import LocationIndex
+from price_index import PriceIndex, PRICE_CSV_PATH
+
+
+FORMAT_VERSION = 1
+TOP_K = 3
+PRICE_WEIGHT = 0.6
+SUIT_WEIGHT = 0.4
+
+# Fields kept per combination; environment and debug blocks are derivable
+EXPORT_FIELDS = (
+    "suitable_crop", "most_profitable_crop", "most_profitable_price",
+    "most_profitable_price_level", "top_3",
+)
+
+
+def slugify(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+def fingerprint(*parts) -> str:
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else json.dumps(part, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def preset_environments():
+    """All soil x season presets as (soil, season) keys and raw feature rows"""
+    keys, rows = [], []
+    for soil_type in main.soil_map:
+        for season in main.season_map:
+            params = main.derive_parameters(main.FarmerInput(
+                soil_type=soil_type, season=season, state="", district="", market=""
+            ))
+            keys.append((soil_type, season))
+            rows.append([params[col] for col in main.models_dict['numeric_cols']])
+    return keys, np.array(rows, dtype=float)
+
+
+def build_state(state, districts, env_keys, suit_probs, crops):
+    """Price a state's markets in one batch, then score every combination"""
+    triples = [(state, d, m) for d, markets in districts.items() for m in markets]
+    locations = [main.encode_location(s, d, m) for s, d, m in triples]
+    prices = main.price_crops(crops, locations)
+
+    shard_fp = fingerprint(
+        FORMAT_VERSION, suit_probs.astype(np.float32).tobytes(),
+        [[state, d, m, sorted(p.items())] for (_, d, m), p in zip(triples, prices)],
+        [TOP_K, PRICE_WEIGHT, SUIT_WEIGHT],
+    )
+
+    def build():
+        markets = {}
+        for (_, district, market), location_prices in zip(triples, prices):
+            by_soil = markets.setdefault(district, {}).setdefault(market, {})
+            for (soil_type, season), probs in zip(env_keys, suit_probs):
+                result = main.score_crops(probs, location_prices, top_k=TOP_K,
+                                          price_weight=PRICE_WEIGHT, suit_weight=SUIT_WEIGHT)
+                by_soil.setdefault(soil_type, {})[season] = {k: result[k] for k in EXPORT_FIELDS}
+        return {
+            "format": FORMAT_VERSION,
+            "state": state,
+            "fingerprint": shard_fp,
+            "scoring_weights": {"price_weight": PRICE_WEIGHT, "suitability_weight": SUIT_WEIGHT},
+            "districts": markets,
+        }
+
+    return shard_fp, len(triples) * len(env_keys), build
+
+
+def export(models_path, prices_path, out_dir, full=False):
+    start = time.perf_counter()
+    out_dir = Path(out_dir)
+    shard_dir = out_dir / "states"
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / "manifest.json"
+
+    previous = {}
+    if manifest_path.exists() and not full:
+        previous = json.loads(manifest_path.read_text()).get("states", {})
+
+    print(f"📂 Loading models from {models_path}...")
+    main.install_models(joblib.load(models_path))
+    locations = LocationIndex.from_price_index(
+        PriceIndex.from_csv(prices_path), main.models_dict['label_encoders']
+    )
+
+    env_keys, env_rows = preset_environments()
+    suit_probs, _ = main.predict_suitability(env_rows)
+    crops = main.candidate_crops(suit_probs)
+    print(f"🌱 {len(env_keys)} environments, {len(crops)} candidate crops, "
+          f"{len(locations.hierarchy)} states")
+
+    states = {}
+    rebuilt, reused, combinations = 0, 0, 0
+    for state, districts in locations.hierarchy.items():
+        shard_fp, count, build = build_state(state, districts, env_keys, suit_probs, crops)
+        combinations += count
+        filename = f"{slugify(state)}.{shard_fp[:8]}.json.gz"
+        entry = previous.get(state)
+
+        if entry and entry["fingerprint"] == shard_fp and (shard_dir / entry["file"]).exists():
+            states[state] = entry
+            reused += 1
+            continue
+
+        payload = json.dumps(build(), separators=(',', ':')).encode()
+        tmp = shard_dir / (filename + ".tmp")
+        tmp.write_bytes(gzip.compress(payload, mtime=0))
+        tmp.replace(shard_dir / filename)
+
+        states[state] = {
+            "file": filename,
+            "fingerprint": shard_fp,
+            "combinations": count,
+            "bytes": (shard_dir / filename).stat().st_size,
+        }
+        rebuilt += 1
+        print(f"   • {state}: {count} combinations -> {filename}")
+
+    build_seconds = time.perf_counter() - start
+    manifest = {
+        "format": FORMAT_VERSION,
+        "version": fingerprint(sorted((s, e["fingerprint"]) for s, e in states.items())),
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "soil_types": list(main.soil_map),
+        "seasons": list(main.season_map),
+        "combinations": combinations,
+        "build_seconds": round(build_seconds, 3),
+        "states": states,
+    }
+    tmp = manifest_path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    tmp.replace(manifest_path)
+
+    # Shards no longer referenced by the manifest
+    live = {e["file"] for e in states.values()}
+    for path in shard_dir.glob("*.json.gz"):
+        if path.name not in live:
+            path.unlink()
+
+    total_bytes = sum(e["bytes"] for e in states.values())
+    print(f"\n✅ Export {manifest['version']}: {combinations} combinations, "
+          f"{rebuilt} states rebuilt, {reused} reused, {total_bytes / 1024:.1f} KB")
+    print(f"⏱️  Total build time: {build_seconds:.2f}s")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export precomputed crop recommendations per state")
+    parser.add_argument("--models", default=str(main.MODEL_PATH), help="Path to all_models.pkl")
+    parser.add_argument("--prices", default=str(PRICE_CSV_PATH), help="Path to crop_price.csv")
+    parser.add_argument("--out", default="recommendations_export", help="Output directory")
+    parser.add_argument("--full", action="store_true", help="Rebuild every state, ignoring the previous manifest")
+    args = parser.parse_args()
+
+    # Per-combination scoring would otherwise log every fallback
+    main.logger.setLevel(logging.ERROR)
+    export(args.models, args.prices, args.out, full=args.full)
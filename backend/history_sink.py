@@ -0,0 +1,167 @@
+# history_sink.py
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB_PATH = Path(__file__).resolve().parent / "history.db"
+
+
+class HistoryStore(ABC):
+    """Destination for recommendation history; implement write_batch to plug in a backend"""
+
+    @abstractmethod
+    def write_batch(self, records: list):
+        ...
+
+    def close(self):
+        pass
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """
+    Local stand-in for the Supabase crop_recommendations table.
+    Only the sink's writer thread touches the connection.
+    """
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = str(path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS crop_recommendations (
+                id TEXT PRIMARY KEY,
+                user_id TEXT,
+                state TEXT NOT NULL,
+                district TEXT NOT NULL,
+                market TEXT,
+                soil_type TEXT,
+                season TEXT,
+                profitable_crops TEXT,
+                suitable_crop TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def write_batch(self, records: list):
+        self._conn.executemany(
+            """
+            INSERT INTO crop_recommendations
+                (id, user_id, state, district, market, soil_type, season,
+                 profitable_crops, suitable_crop, created_at)
+            VALUES
+                (:id, :user_id, :state, :district, :market, :soil_type, :season,
+                 :profitable_crops, :suitable_crop, :created_at)
+            """,
+            records
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def history_record(farmer_input, result: dict, user_id=None) -> dict:
+    """Row for the history table from a request and its recommendation"""
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "state": farmer_input.state,
+        "district": farmer_input.district,
+        "market": farmer_input.market,
+        "soil_type": getattr(farmer_input, "soil_type", None),
+        "season": getattr(farmer_input, "season", None),
+        "profitable_crops": json.dumps(result["top_3"]),
+        "suitable_crop": json.dumps({"name": result["suitable_crop"]}),
+        "created_at": time.time(),
+    }
+
+
+class WriteBehindSink:
+    """
+    Buffer history records in memory and write them from a background
+    thread in batches of `batch_size`, or every `flush_interval` seconds,
+    whichever comes first.
+
+    submit() never blocks: when the bounded queue is full the record is
+    dropped and counted, so persistence can fall behind but never slows the
+    request path. close() drains whatever is queued.
+    """
+
+    def __init__(self, store: HistoryStore, batch_size=100, flush_interval=2.0, max_queue=10000):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+        self._in_flight = 0
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: dict) -> bool:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    def _next_batch(self) -> list:
+        """Block until a full batch is available or the flush interval passes"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or (self._stop.is_set() and self._queue.empty()):
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(timeout, 0.1)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _write(self, batch: list):
+        try:
+            self.store.write_batch(batch)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            logger.error("History batch of %d failed: %s", len(batch), e)
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._in_flight = len(batch)
+                self._write(batch)
+                self._in_flight = 0
+
+    def close(self, timeout=10.0):
+        """
+        Flush queued records, then release the store. If the writer is still
+        busy after `timeout`, the store is left open for it and the records
+        not yet written are logged instead.
+        """
+        self._stop.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("History writer still busy after %.1fs; %d record(s) not yet written",
+                           timeout, self._queue.qsize() + self._in_flight)
+            return False
+        self.store.close()
+        return True
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "queued": self._queue.qsize()}
@@ -0,0 +1,287 @@
+# hyperparam_search.py
+"""
+Cross-validated hyperparameter search for the suitability classifier and
+the price VotingRegressor.
+
+    python hyperparam_search.py                       # both models
+    python hyperparam_search.py --model price --workers 4
+    python hyperparam_search.py --no-prune            # score every fold of every config
+
+Folds run in a process pool. The preprocessed data comes from the training
+cache and is written once as .npy files that workers memory-map read-only.
+Every (config, fold) score is stored under <cache>/search/, so an
+interrupted search resumes where it stopped. After each fold round, configs
+clearly behind the current best are dropped.
+
+The report lists, per config, the CV score next to single-row and batch
+inference latency and the pickled model size.
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, mean_absolute_error
+from sklearn.model_selection import KFold, StratifiedKFold
+
+import ml_model_tf as training
+from training_cache import TrainingCache, TRAINING_CACHE_DIR, file_digest, fingerprint
+
+
+# Values tried on top of the defaults in ml_model_tf; dotted keys address ensemble members
+SEARCH_SPACES = {
+    'suitability': {
+        'n_estimators': [100, 200],
+        'max_depth': [10, 20, None],
+        'min_samples_leaf': [1, 2],
+    },
+    'price': {
+        'rf.n_estimators': [50, 100],
+        'rf.max_depth': [10, 15],
+        'gb.n_estimators': [100, 200],
+        'gb.learning_rate': [0.05, 0.1],
+    },
+}
+
+SEARCH_FOLDS = {'suitability': 3, 'price': 5}
+
+# A config is pruned once its mean over the folds done so far is this far behind the best
+PRUNE_ACCURACY_MARGIN = 0.02
+PRUNE_MAE_RATIO = 1.15
+
+
+def candidate_configs(kind):
+    """Full parameter dicts for every point of the search grid"""
+    base = training.SUITABILITY_PARAMS if kind == 'suitability' else training.PRICE_MODEL_PARAMS
+    space = SEARCH_SPACES[kind]
+    configs = []
+    for values in itertools.product(*space.values()):
+        params = json.loads(json.dumps(base))
+        for name, value in zip(space, values):
+            target = params
+            *path, leaf = name.split('.')
+            for part in path:
+                target = target[part]
+            target[leaf] = value
+        configs.append(params)
+    return configs
+
+
+def build_model(kind, params):
+    # One core per model: the pool provides the parallelism
+    if kind == 'suitability':
+        return training.make_suitability_model(params, n_jobs=1)
+    return training.make_price_model(params, n_jobs=1)
+
+
+# ---------- Worker side ----------
+
+_shared = {}
+
+
+def _init_worker(data_paths):
+    """Memory-map the shared arrays once per worker process"""
+    for kind, (x_path, y_path) in data_paths.items():
+        _shared[kind] = (np.load(x_path, mmap_mode='r'), np.load(y_path, mmap_mode='r'))
+
+
+def _score_fold(kind, params, fold, n_folds, measure):
+    X, y = _shared[kind]
+    if kind == 'suitability':
+        splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42)
+    else:
+        splitter = KFold(n_splits=n_folds, shuffle=True, random_state=42)
+    train_idx, test_idx = list(splitter.split(X, y))[fold]
+
+    model = build_model(kind, params)
+    start = time.perf_counter()
+    model.fit(X[train_idx], y[train_idx])
+    result = {'fit_seconds': time.perf_counter() - start}
+
+    predictions = model.predict(X[test_idx])
+    if kind == 'suitability':
+        result['score'] = accuracy_score(y[test_idx], predictions)
+    else:
+        result['score'] = mean_absolute_error(y[test_idx], predictions)
+
+    if measure:
+        result.update(_measure_model(model, X[test_idx]))
+    return result
+
+
+def _measure_model(model, X_test, repeats=50):
+    """Inference latency (one row and per row in a batch) and pickled size"""
+    row = np.asarray(X_test[:1])
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - start)
+
+    batch = np.asarray(X_test[:1000])
+    start = time.perf_counter()
+    model.predict(batch)
+    batch_seconds = time.perf_counter() - start
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return {
+        'latency_ms': float(np.median(timings)) * 1000,
+        'batch_latency_us_per_row': batch_seconds / len(batch) * 1e6,
+        'artifact_bytes': buffer.getbuffer().nbytes,
+    }
+
+
+# ---------- Driver ----------
+
+def load_search_data(cache, price_csv, suitable_csv):
+    """Preprocessed (X, y) per model, taken from the training cache when available"""
+    crop_price = pd.read_csv(price_csv)
+    crop_suitable_raw = pd.read_csv(suitable_csv)
+
+    suit_key = training.suitability_data_key(cache, file_digest(suitable_csv), crop_price)
+    suit, _ = cache.get_or_compute('suitability_data', suit_key,
+                                   lambda: training.prepare_suitability_data(crop_suitable_raw, crop_price))
+
+    price_key = training.price_data_key(cache, file_digest(price_csv))
+    price, _ = cache.get_or_compute('price_data', price_key, lambda: training.prepare_price_data(crop_price))
+    avg_price = price['avg_price']
+
+    return {
+        'suitability': (suit_key, suit['X'], suit['y']),
+        'price': (price_key, avg_price[['state', 'district', 'market', 'commodity']].to_numpy(),
+                  avg_price['price'].to_numpy()),
+    }
+
+
+def _is_losing(kind, mean, best):
+    if kind == 'suitability':
+        return mean < best - PRUNE_ACCURACY_MARGIN
+    return mean > best * PRUNE_MAE_RATIO
+
+
+def search(kinds, workers, out_path, prune=True, cache_dir=TRAINING_CACHE_DIR,
+           price_csv="crop_price.csv", suitable_csv="crop_suitable.csv"):
+    start = time.perf_counter()
+    cache = TrainingCache(cache_dir)
+    search_dir = Path(cache_dir) / "search"
+    search_dir.mkdir(parents=True, exist_ok=True)
+
+    print("📂 Loading preprocessed data...")
+    data = load_search_data(cache, price_csv, suitable_csv)
+
+    data_paths, data_keys = {}, {}
+    for kind in kinds:
+        data_key, X, y = data[kind]
+        data_keys[kind] = data_key
+        x_path, y_path = search_dir / f"{kind}-{data_key}-X.npy", search_dir / f"{kind}-{data_key}-y.npy"
+        if not x_path.exists():
+            np.save(x_path, np.ascontiguousarray(X))
+            np.save(y_path, np.ascontiguousarray(y))
+        data_paths[kind] = (str(x_path), str(y_path))
+
+    # (kind, config index) -> state
+    trials = {}
+    for kind in kinds:
+        for i, params in enumerate(candidate_configs(kind)):
+            trials[(kind, i)] = {'params': params, 'folds': {}, 'pruned_after': None}
+        print(f"🔍 {kind}: {sum(1 for k in trials if k[0] == kind)} configs x {SEARCH_FOLDS[kind]} folds")
+
+    def fold_path(kind, params, fold):
+        key = fingerprint(data_keys[kind], params, SEARCH_FOLDS[kind], fold)
+        return search_dir / f"{kind}-fold-{key}.json"
+
+    resumed, computed = 0, 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_paths,)) as pool:
+        for fold in range(max(SEARCH_FOLDS[k] for k in kinds)):
+            pending = {}
+            for (kind, i), trial in trials.items():
+                if fold >= SEARCH_FOLDS[kind] or trial['pruned_after'] is not None:
+                    continue
+                path = fold_path(kind, trial['params'], fold)
+                if path.exists():
+                    trial['folds'][fold] = json.loads(path.read_text())
+                    resumed += 1
+                    continue
+                future = pool.submit(_score_fold, kind, trial['params'], fold, SEARCH_FOLDS[kind], fold == 0)
+                pending[future] = (kind, i, path)
+
+            for future in as_completed(pending):
+                kind, i, path = pending[future]
+                result = future.result()
+                path.write_text(json.dumps(result))
+                trials[(kind, i)]['folds'][fold] = result
+                computed += 1
+
+            if prune:
+                for kind in kinds:
+                    alive = {k: t for k, t in trials.items() if k[0] == kind and t['pruned_after'] is None
+                             and fold in t['folds']}
+                    means = {k: np.mean([f['score'] for f in t['folds'].values()]) for k, t in alive.items()}
+                    if not means:
+                        continue
+                    best = max(means.values()) if kind == 'suitability' else min(means.values())
+                    for k, mean in means.items():
+                        if _is_losing(kind, mean, best):
+                            trials[k]['pruned_after'] = fold + 1
+
+            alive_count = sum(1 for t in trials.values() if t['pruned_after'] is None)
+            print(f"   • fold round {fold + 1}: {len(pending)} scored, {alive_count} configs still in the running")
+
+    report = {"search_seconds": round(time.perf_counter() - start, 2), "workers": workers,
+              "folds_computed": computed, "folds_resumed": resumed}
+    for kind in kinds:
+        rows = []
+        for (k, i), trial in trials.items():
+            if k != kind:
+                continue
+            scores = [f['score'] for _, f in sorted(trial['folds'].items())]
+            first = trial['folds'][0]
+            rows.append({
+                "params": trial['params'],
+                "metric": "accuracy" if kind == 'suitability' else "mae",
+                "score": float(np.mean(scores)),
+                "score_std": float(np.std(scores)),
+                "folds_scored": len(scores),
+                "pruned_after_fold": trial['pruned_after'],
+                "fit_seconds": float(np.mean([f['fit_seconds'] for f in trial['folds'].values()])),
+                "latency_ms": first['latency_ms'],
+                "batch_latency_us_per_row": first['batch_latency_us_per_row'],
+                "artifact_bytes": first['artifact_bytes'],
+            })
+        # Fully evaluated configs first, best score first
+        rows.sort(key=lambda r: (r['pruned_after_fold'] is not None,
+                                 -r['score'] if kind == 'suitability' else r['score']))
+        report[kind] = {"best_params": rows[0]['params'], "configs": rows}
+
+        print(f"\n📊 {kind} ({rows[0]['metric']}):")
+        for row in rows:
+            flag = f"pruned@{row['pruned_after_fold']}" if row['pruned_after_fold'] else "full"
+            print(f"   {row['score']:>10.4f} ±{row['score_std']:.4f}  {row['latency_ms']:7.2f} ms/row  "
+                  f"{row['artifact_bytes'] / 2**20:7.1f} MB  {flag:<9} {json.dumps(row['params'])}")
+
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Search finished in {report['search_seconds']:.1f}s "
+          f"({computed} folds computed, {resumed} resumed) -> {out_path}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search")
+    parser.add_argument("--model", choices=["suitability", "price", "both"], default="both")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--out", default="search_report.json", help="Report path")
+    parser.add_argument("--no-prune", action="store_true", help="Evaluate every fold of every config")
+    parser.add_argument("--cache-dir", default=str(TRAINING_CACHE_DIR), help="Training cache directory")
+    args = parser.parse_args()
+
+    kinds = ["suitability", "price"] if args.model == "both" else [args.model]
+    search(kinds, args.workers, args.out, prune=not args.no_prune, cache_dir=args.cache_dir)
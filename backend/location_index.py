@@ -0,0 +1,129 @@
+# location_index.py
+import hashlib
+import json
+from bisect import bisect_left
+from typing import Iterable, Optional
+
+from price_index import normalize_key
+
+
+LEVELS = ('state', 'district', 'market')
+
+
+class LocationIndex:
+    """
+    State -> District -> Market hierarchy built from the price data.
+
+    Exact lookups go through dicts keyed on normalized names, so validating a
+    location is O(1). Prefix autocomplete uses one sorted key list per scope
+    (global, per state, per district) and a bisect, so a query never scans
+    names outside the requested scope.
+    """
+
+    def __init__(self, triples: Iterable[tuple], label_encoders: Optional[dict] = None):
+        self.hierarchy = {}
+        self._canonical = {level: {} for level in LEVELS}
+        scoped = {}
+
+        for state, district, market in triples:
+            s_key, d_key, m_key = normalize_key(state), normalize_key(district), normalize_key(market)
+            self._canonical['state'].setdefault((s_key,), state)
+            self._canonical['district'].setdefault((s_key, d_key), district)
+            self._canonical['market'].setdefault((s_key, d_key, m_key), market)
+
+            markets = self.hierarchy.setdefault(state, {}).setdefault(district, [])
+            if market not in markets:
+                markets.append(market)
+
+            for scope, key, entry in (
+                (('state',), s_key, {"state": state}),
+                (('district',), d_key, {"state": state, "district": district}),
+                (('district', s_key), d_key, {"state": state, "district": district}),
+                (('market',), m_key, {"state": state, "district": district, "market": market}),
+                (('market', s_key), m_key, {"state": state, "district": district, "market": market}),
+                (('market', s_key, d_key), m_key, {"state": state, "district": district, "market": market}),
+                (('market', None, d_key), m_key, {"state": state, "district": district, "market": market}),
+            ):
+                scoped.setdefault(scope, {}).setdefault((key, tuple(entry.values())), entry)
+
+        self.hierarchy = {
+            s: {d: sorted(ms) for d, ms in sorted(districts.items())}
+            for s, districts in sorted(self.hierarchy.items())
+        }
+
+        # scope -> (sorted normalized keys, entries in the same order)
+        self._prefix = {}
+        for scope, entries in scoped.items():
+            ordered = sorted(entries.items())
+            self._prefix[scope] = ([k[0] for k, _ in ordered], [e for _, e in ordered])
+
+        # Names the price model can actually encode (anything else falls back)
+        self._encodable = None
+        if label_encoders is not None:
+            self._encodable = {
+                level: set(label_encoders[level].classes_.tolist()) for level in LEVELS
+            }
+
+        payload = json.dumps(self.hierarchy, separators=(',', ':'), sort_keys=True)
+        self.version = hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+    @classmethod
+    def from_price_index(cls, price_index, label_encoders: Optional[dict] = None):
+        """Build from the unique (state, district, market) triples of a PriceIndex"""
+        triples = dict.fromkeys(
+            (r['state'], r['district'], r['market']) for r in price_index.records
+        )
+        return cls(triples, label_encoders)
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+    def complete(self, prefix: str, level: str = 'market', state: Optional[str] = None,
+                 district: Optional[str] = None, limit: int = 10) -> list:
+        """
+        Names at `level` starting with `prefix`, optionally within a state
+        and/or district. A district without a state matches that district
+        name in every state.
+        """
+        if level not in LEVELS:
+            raise ValueError(f"Invalid level. Must be one of: {', '.join(LEVELS)}")
+
+        scope = (level,)
+        if level != 'state' and state:
+            scope += (normalize_key(state),)
+            if level == 'market' and district:
+                scope += (normalize_key(district),)
+        elif level == 'market' and district:
+            scope += (None, normalize_key(district))
+
+        keys, entries = self._prefix.get(scope, ([], []))
+        prefix = normalize_key(prefix)
+        start = bisect_left(keys, prefix)
+        results = []
+        for i in range(start, len(keys)):
+            if len(results) >= limit or not keys[i].startswith(prefix):
+                break
+            results.append(entries[i])
+        return results
+
+    def resolve(self, state: str, district: str, market: str) -> dict:
+        """
+        Map user-supplied names to canonical spellings in O(1).
+        Unknown levels (and everything below them) come back as None.
+        """
+        s_key, d_key, m_key = normalize_key(state), normalize_key(district), normalize_key(market)
+        resolved = {
+            'state': self._canonical['state'].get((s_key,)),
+            'district': self._canonical['district'].get((s_key, d_key)),
+            'market': self._canonical['market'].get((s_key, d_key, m_key)),
+        }
+        if self._encodable is not None:
+            for level in LEVELS:
+                if resolved[level] not in self._encodable[level]:
+                    resolved[level] = None
+        if resolved['state'] is None:
+            resolved['district'] = None
+        if resolved['district'] is None:
+            resolved['market'] = None
+        return resolved
@@ -0,0 +1,155 @@
+# logging_setup.py
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and extra fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Rate-limit and sample log records before they are queued.
+
+    Each (logger, message template) pair gets a token bucket of `rate_limit`
+    records per second. Records below WARNING are additionally sampled at
+    `sample_rate`. ERROR and above always pass. When a template has been
+    suppressed, the next record that passes carries a `suppressed` count.
+    """
+
+    def __init__(self, rate_limit: float = 20.0, sample_rate: float = 1.0):
+        super().__init__()
+        self.rate_limit = rate_limit
+        self.sample_rate = sample_rate
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            return True
+        if record.levelno < logging.WARNING and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if self.rate_limit <= 0:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, suppressed = self._buckets.get(key, (self.rate_limit, now, 0))
+            tokens = min(self.rate_limit, tokens + (now - last) * self.rate_limit)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, suppressed + 1)
+                return False
+            self._buckets[key] = (tokens - 1, now, 0)
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hand records to a bounded queue without formatting them.
+
+    The stock QueueHandler renders the message in the calling thread; here
+    that work is left to the listener thread, so a log call on the request
+    path costs one filter check and one queue put. When the queue is full
+    the record is dropped and counted instead of blocking.
+    """
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: QueueListener | None = None
+_handler: NonBlockingQueueHandler | None = None
+
+
+def setup_logging(level=None, fmt=None, rate_limit=None, sample_rate=None, queue_size=10000):
+    """
+    Route all logging through a background thread.
+
+    Defaults come from LOG_LEVEL (INFO), LOG_FORMAT ("json" or "text"),
+    LOG_RATE_LIMIT (records per second per message template, 0 = off) and
+    LOG_SAMPLE_RATE (fraction of DEBUG/INFO records kept).
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return _handler
+
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    fmt = fmt or os.getenv("LOG_FORMAT", "json")
+    rate_limit = float(os.getenv("LOG_RATE_LIMIT", "20") if rate_limit is None else rate_limit)
+    sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "1.0") if sample_rate is None else sample_rate)
+
+    stream = logging.StreamHandler()
+    if fmt == "json":
+        stream.setFormatter(StructuredFormatter())
+    else:
+        stream.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    _handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    _handler.addFilter(SamplingFilter(rate_limit=rate_limit, sample_rate=sample_rate))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers = [_handler]
+
+    _listener = QueueListener(_handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _handler
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> dict:
+    """Queue depth and drop counter of the async pipeline"""
+    if _handler is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+    }
@@ -1,24 +1,50 @@
 # main.py (FIXED VERSION)
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, File, Header, HTTPException, Query, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 import numpy as np
 import joblib
-from typing import Optional
+from typing import Dict, List, Optional
+from collections import OrderedDict
+from itertools import islice
+import csv
+import io
+import json
 import logging
+import os
+import secrets
+import threading
+import time
+import uuid
 from pathlib import Path
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+from price_index import PriceIndex, PRICE_CSV_PATH, SORT_FIELDS
+from location_index import LocationIndex, LEVELS
+from logging_setup import setup_logging, logging_stats
+from history_sink import HISTORY_DB_PATH, SQLiteHistoryStore, WriteBehindSink, history_record
+from model_registry import ModelRegistry, ModelVersion, ROUTING_MODES
+from ml_model_tf import (
+    compact_is_current, load_rollup_tables, lookup_rollup_price, validate_user_input
 )
+
+# Faster JSON encoding when orjson is installed (falls back to the stdlib encoder)
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
+
+# Setup logging (queue-based, formatted off the request path; see logging_setup.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Crop Recommendation API",
     description="AI-powered crop recommendation based on soil, weather, and market data",
-    version="2.0"
+    version="2.0",
+    default_response_class=FastJSONResponse
 )
 
 # ✅ Enable CORS
@@ -28,8 +54,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Job-Id", "X-Model-Version"],
 )
 
+# ✅ Compress larger responses (price pages, hierarchy dumps)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # ---------- Input Model ----------
 class FarmerInput(BaseModel):
     soil_type: str = Field(..., description="Soil type: Loamy, Clay, Sandy, or Black")
@@ -50,6 +80,112 @@ class FarmerInput(BaseModel):
         }
 
 
+class SoilTestInput(BaseModel):
+    N: float = Field(..., description="Nitrogen (kg/ha), 0-200")
+    P: float = Field(..., description="Phosphorus (kg/ha), 0-200")
+    K: float = Field(..., description="Potassium (kg/ha), 0-200")
+    temperature: float = Field(..., description="Temperature (°C), -10 to 60")
+    humidity: float = Field(..., description="Relative humidity (%), 0-100")
+    ph: float = Field(..., description="Soil pH, 0-14")
+    rainfall: float = Field(..., description="Rainfall (mm), 0-500")
+    state: str = Field(..., description="State name")
+    district: str = Field(..., description="District name")
+    market: str = Field(..., description="Market name")
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "N": 90, "P": 42, "K": 43,
+                "temperature": 21.0, "humidity": 82.0,
+                "ph": 6.5, "rainfall": 203.0,
+                "state": "Karnataka",
+                "district": "Belgaum",
+                "market": "Kudchi"
+            }
+        }
+
+
+class ModelLoadRequest(BaseModel):
+    name: str = Field(..., description="Version name to register the bundle under")
+    bundle: str = Field(..., description="File name of a model bundle in MODELS_DIR, e.g. all_models.compact.pkl")
+
+
+class CandidateConfig(BaseModel):
+    name: Optional[str] = Field(None, description="Registered version to compare against the active one; null clears it")
+    fraction: float = Field(0.0, ge=0.0, le=1.0, description="Share of /predict requests that involve the candidate")
+    mode: str = Field("shadow", description="shadow: candidate scored off the response path; split: candidate answers")
+
+
+# ---------- Response Models ----------
+class CropRecommendation(BaseModel):
+    crop: str
+    predicted_price: Optional[float] = None
+    price_level: Optional[str] = Field(None, description="model, market, district, state or national")
+    suitability_score: float = Field(..., description="Suitability probability, %")
+    combined_score: float = Field(..., description="Weighted price/suitability score, %")
+
+
+class DerivedParameters(BaseModel):
+    N: float
+    P: float
+    K: float
+    temperature: float
+    humidity: float
+    ph: float
+    rainfall: float
+
+
+class EnvironmentInfo(BaseModel):
+    soil_type: Optional[str] = None
+    season: Optional[str] = None
+    state: str
+    district: str
+    market: str
+    derived_parameters: DerivedParameters
+
+
+class ScoringWeights(BaseModel):
+    price_weight: float
+    suitability_weight: float
+
+
+class DebugInfo(BaseModel):
+    total_crops_evaluated: int
+    crops_with_prices: int
+    crops_without_prices: int
+    price_levels: Dict[str, int]
+    suitability_source: Optional[str] = None
+
+
+class PredictionResponse(BaseModel):
+    suitable_crop: Optional[str] = None
+    most_profitable_crop: Optional[str] = None
+    most_profitable_price: Optional[float] = None
+    most_profitable_price_level: Optional[str] = None
+    top_3: Optional[List[CropRecommendation]] = None
+    environment: Optional[EnvironmentInfo] = None
+    scoring_weights: Optional[ScoringWeights] = None
+    debug_info: Optional[DebugInfo] = None
+
+
+class ModelInfoResponse(BaseModel):
+    suitability_model: str
+    price_model: str
+    available_crops: int
+    crops_with_price_data: int
+    crop_list: List[str]
+    supported_soil_types: List[str]
+    supported_seasons: List[str]
+
+
+# Blocks most clients never read; dropped by ?compact=true
+DIAGNOSTIC_FIELDS = ("environment", "debug_info")
+
+# Endpoints return FastJSONResponse directly, so the response models above are
+# the published schema only; set VALIDATE_RESPONSES=1 to check every body against them
+VALIDATE_RESPONSES = os.getenv("VALIDATE_RESPONSES", "0") == "1"
+
+
 # ---------- Soil & Season Mapping ----------
 soil_map = {
     "Loamy": {"N": 50, "P": 40, "K": 50, "ph": 6.5},
@@ -67,33 +203,312 @@ season_map = {
 # ---------- Global models dict ----------
 models_dict = None
 model_load_error: str | None = None
+model_info_body: bytes | None = None
 MODEL_PATH = Path(__file__).resolve().parent / "all_models.pkl"
+COMPACT_MODEL_PATH = MODEL_PATH.with_name("all_models.compact.pkl")
+# "compact": load all_models.compact.pkl when it exists and was made from the current all_models.pkl;
+# "sklearn": always load the original estimators
+MODEL_FORMAT = os.getenv("MODEL_FORMAT", "compact")
+loaded_model_path: Path | None = None
+# "full": the random forest; "distilled": its smallest sub-forest that passed the training checks, when the bundle has one
+SUITABILITY_MODEL = os.getenv("SUITABILITY_MODEL", "full")
+
+# ---------- Model registry (loaded versions, candidate routing) ----------
+model_registry = ModelRegistry(max_shadow_pending=int(os.getenv("SHADOW_MAX_PENDING", "100")))
+MODEL_VERSION = os.getenv("MODEL_VERSION", "current")
+# Optional second bundle compared against the active one on live traffic
+MODEL_CANDIDATE_PATH = os.getenv("MODEL_CANDIDATE_PATH")
+MODEL_CANDIDATE_VERSION = os.getenv("MODEL_CANDIDATE_VERSION", "candidate")
+CANDIDATE_TRAFFIC = float(os.getenv("CANDIDATE_TRAFFIC", "0.1"))
+CANDIDATE_MODE = os.getenv("CANDIDATE_MODE", "shadow")
+# /models endpoints need this in the X-Admin-Token header; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# /models/load only reads bundles from this directory
+MODELS_DIR = Path(os.getenv("MODELS_DIR", str(MODEL_PATH.parent))).resolve()
+
+# ---------- Global price index ----------
+price_index: PriceIndex | None = None
+MAX_PRICE_PAGE_SIZE = 200
+PRICE_CACHE_MAX_AGE = 3600
+
+# ---------- Global location index ----------
+location_index: LocationIndex | None = None
+# "correct": fix case/spacing of known names, let unknown ones fall back to national prices
+# "strict": reject unknown locations with 400 and suggestions
+LOCATION_POLICY = os.getenv("LOCATION_POLICY", "correct")
+
+# ---------- Recommendation history (write-behind) ----------
+history_sink: WriteBehindSink | None = None
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "1") == "1"
+HISTORY_DB = os.getenv("HISTORY_DB", str(HISTORY_DB_PATH))
+
+# Crops below this suitability probability are not scored
+MIN_SUITABILITY = 0.01
+
+# ---------- Soil-test suitability cache ----------
+# Decimal places soil-test reports carry; soil-test inputs are rounded to them
+# so repeated readings map to the same cached suitability row
+SOIL_TEST_PRECISION = {"N": 0, "P": 0, "K": 0, "temperature": 1, "humidity": 0, "ph": 1, "rainfall": 0}
+SUITABILITY_CACHE_SIZE = int(os.getenv("SUITABILITY_CACHE_SIZE", "4096"))
+
+
+class SuitabilityCache:
+    """Bounded LRU of exact suitability probabilities keyed on the raw feature row"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            probs = self.entries.get(key)
+            if probs is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return probs
+
+    def put(self, key: tuple, probs: np.ndarray):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self.entries[key] = probs
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"size": len(self.entries), "max_size": self.max_size,
+                    "hits": self.hits, "misses": self.misses}
 
 
 # ---------- Load Models on Startup ----------
+def prepare_models(loaded: dict) -> dict:
+    """Serving view of a loaded bundle: rollup lookup tables and the configured suitability model"""
+    models = {**loaded, 'price_rollup_tables': None,
+              'suitability_cache': SuitabilityCache(SUITABILITY_CACHE_SIZE)}
+    if 'price_rollups' in loaded:
+        models['price_rollup_tables'] = load_rollup_tables(loaded['price_rollups'])
+    if SUITABILITY_MODEL == "distilled":
+        if loaded.get('suitability_model_distilled') is not None:
+            models['suitability_model'] = loaded['suitability_model_distilled']
+        else:
+            logger.warning("SUITABILITY_MODEL=distilled but the model file has no accepted distilled model; "
+                           "serving the full forest")
+    return models
+
+
+def activate_version(version: ModelVersion):
+    """
+    Point the default request path at a registered version. The location
+    index is rebuilt against its encoders, so only names this version's
+    price model can encode are treated as known.
+    """
+    global models_dict, model_info_body, location_index
+    models_dict = version.models
+    model_info_body = None
+    if price_index is not None:
+        location_index = LocationIndex.from_price_index(price_index, version.models['label_encoders'])
+
+
+def install_models(loaded: dict, name: str = MODEL_VERSION, source: Optional[str] = None) -> ModelVersion:
+    """
+    Register a loaded model bundle and make it the one used by the request
+    path. A version already registered under `name` is replaced, even if
+    active (e.g. the app starting again in the same process).
+    """
+    version = model_registry.register(name, prepare_models(loaded), source, replace_active=True)
+    if model_registry.active is not version:
+        model_registry.promote(name)
+    activate_version(version)
+    return version
+
+
+def load_model_bundle():
+    """
+    (bundle, path) per MODEL_FORMAT. The compact bundle can be deployed on
+    its own; when all_models.pkl is present too, a compact bundle not made
+    from it (left by an earlier training run) is skipped in its favour.
+    """
+    if MODEL_FORMAT == "compact" and COMPACT_MODEL_PATH.exists():
+        compact = joblib.load(COMPACT_MODEL_PATH)
+        if not MODEL_PATH.exists():
+            return compact, COMPACT_MODEL_PATH
+        if compact_is_current(compact.get('compact', {}), MODEL_PATH):
+            return compact, COMPACT_MODEL_PATH
+        logger.warning("⚠️ %s was not built from the current %s; loading the original bundle",
+                       COMPACT_MODEL_PATH.name, MODEL_PATH.name)
+    return joblib.load(MODEL_PATH), MODEL_PATH
+
+
 @app.on_event("startup")
 async def load_models():
     """Load all models and preprocessors on application startup"""
-    global models_dict, model_load_error
+    global models_dict, model_load_error, loaded_model_path
     model_load_error = None
     try:
-        models_dict = joblib.load(MODEL_PATH)
-        logger.info(f"✅ Models loaded successfully from {MODEL_PATH}:")
-        logger.info(f"   - Suitability Model: {type(models_dict['suitability_model']).__name__}")
-        logger.info(f"   - Price Model: {type(models_dict['price_model']).__name__}")
-        logger.info(f"   - Available crops: {len(models_dict['crop_encoder'].classes_)}")
-        logger.info(f"   - Crops with prices: {len(models_dict['avg_prices_by_crop'])}")
+        started = time.perf_counter()
+        loaded, path = load_model_bundle()
+        install_models(loaded, source=str(path))
+        loaded_model_path = path
+        logger.info(
+            "✅ Models loaded successfully from %s", path,
+            extra={
+                "suitability_model": type(models_dict['suitability_model']).__name__,
+                "price_model": type(models_dict['price_model']).__name__,
+                "available_crops": len(models_dict['crop_encoder'].classes_),
+                "crops_with_prices": len(models_dict['avg_prices_by_crop']),
+                "load_seconds": round(time.perf_counter() - started, 3),
+            }
+        )
+        if models_dict['price_rollup_tables'] is None:
+            logger.warning("   - No price rollups in model file; retrain for district/state fallback")
     except FileNotFoundError:
         model_load_error = "'all_models.pkl' not found. Please train the model first."
-        logger.error("❌ " + model_load_error)
+        logger.error("❌ %s", model_load_error)
         models_dict = None
     except Exception as e:
         model_load_error = f"Error loading models: {e}"
-        logger.error("❌ " + model_load_error)
+        logger.error("❌ %s", model_load_error)
         models_dict = None
 
 
+@app.on_event("startup")
+async def load_candidate_model():
+    """Register MODEL_CANDIDATE_PATH, if set, as the candidate for live comparison"""
+    if not MODEL_CANDIDATE_PATH or models_dict is None:
+        return
+    try:
+        model_registry.register(MODEL_CANDIDATE_VERSION, prepare_models(joblib.load(MODEL_CANDIDATE_PATH)),
+                                MODEL_CANDIDATE_PATH)
+        model_registry.set_candidate(MODEL_CANDIDATE_VERSION, CANDIDATE_TRAFFIC, CANDIDATE_MODE)
+        logger.info("✅ Candidate model '%s' loaded from %s (%s, %.0f%% of traffic)",
+                    MODEL_CANDIDATE_VERSION, MODEL_CANDIDATE_PATH, CANDIDATE_MODE, CANDIDATE_TRAFFIC * 100)
+    except Exception as e:
+        logger.error("❌ Could not load candidate model: %s", e)
+
+
+@app.on_event("startup")
+async def load_price_index():
+    """Build the in-memory price and location indexes used by /prices and /locations"""
+    global price_index, location_index
+    try:
+        price_index = PriceIndex.from_csv(PRICE_CSV_PATH)
+        logger.info("✅ Price index built: %d records (version %s)", price_index.size, price_index.version)
+    except Exception as e:
+        logger.error("❌ Error building price index: %s", e)
+        price_index = None
+        location_index = None
+        return
+
+    label_encoders = models_dict['label_encoders'] if models_dict is not None else None
+    location_index = LocationIndex.from_price_index(price_index, label_encoders)
+    logger.info("✅ Location index built: %d states (version %s)", len(location_index.hierarchy), location_index.version)
+
+
+@app.on_event("startup")
+async def start_history_sink():
+    """Open the history store and start the background writer"""
+    global history_sink
+    if not HISTORY_ENABLED:
+        return
+    try:
+        history_sink = WriteBehindSink(
+            SQLiteHistoryStore(HISTORY_DB),
+            batch_size=int(os.getenv("HISTORY_BATCH_SIZE", "100")),
+            flush_interval=float(os.getenv("HISTORY_FLUSH_INTERVAL", "2.0")),
+            max_queue=int(os.getenv("HISTORY_MAX_QUEUE", "10000")),
+        )
+        logger.info("✅ Recommendation history writing to %s", HISTORY_DB)
+    except Exception as e:
+        logger.error("❌ Could not open history store: %s", e)
+        history_sink = None
+
+
+@app.on_event("shutdown")
+async def stop_shadow_scoring():
+    """Drop queued shadow work; it never affects responses"""
+    model_registry.close()
+
+
+@app.on_event("shutdown")
+async def stop_history_sink():
+    """Flush pending history records before exit"""
+    global history_sink
+    if history_sink is not None:
+        history_sink.close()
+        logger.info("History sink closed", extra=history_sink.snapshot())
+        history_sink = None
+
+
 # ---------- Helper Functions ----------
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Guard for model management endpoints: ADMIN_TOKEN must be configured and presented"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model management is disabled (ADMIN_TOKEN not set)")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token")
+
+
+def resolve_bundle_path(bundle: str) -> Path:
+    """Path of a bundle file directly inside MODELS_DIR; anything else is rejected"""
+    path = (MODELS_DIR / bundle).resolve()
+    if Path(bundle).name != bundle or path.parent != MODELS_DIR or path.suffix != ".pkl":
+        raise HTTPException(status_code=400, detail="bundle must be the name of a .pkl file in the models directory")
+    return path
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check an If-None-Match header against the current ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def cache_headers(etag: str, max_age: int) -> dict:
+    """HTTP caching headers for static-per-dataset responses"""
+    return {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+
+
+def parse_fields(fields: Optional[str]) -> Optional[set]:
+    """Requested top-level prediction fields; unknown names are a 400 (checked before scoring)"""
+    if not fields:
+        return None
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted - set(PredictionResponse.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(sorted(unknown))}. "
+                   f"Must be among: {', '.join(PredictionResponse.model_fields)}"
+        )
+    return wanted
+
+
+def select_fields(result: dict, wanted: Optional[set] = None, compact: bool = False) -> dict:
+    """Trim a prediction to the requested top-level fields"""
+    if wanted:
+        result = {k: v for k, v in result.items() if k in wanted}
+    if compact:
+        result = {k: v for k, v in result.items() if k not in DIAGNOSTIC_FIELDS}
+    return result
+
+
+def prediction_response(result: dict, wanted: Optional[set], compact: bool, version: ModelVersion) -> Response:
+    """Serialize a (trimmed) prediction, checked against PredictionResponse when VALIDATE_RESPONSES is on"""
+    body = select_fields(result, wanted, compact)
+    if VALIDATE_RESPONSES:
+        PredictionResponse.model_validate(body)
+    return FastJSONResponse(body, headers={"X-Model-Version": version.name})
+
+
 def validate_inputs(farmer_input: FarmerInput):
     """Validate farmer input"""
     if farmer_input.soil_type not in soil_map:
@@ -108,6 +523,52 @@ def validate_inputs(farmer_input: FarmerInput):
         )
 
 
+def resolve_location(farmer_input: FarmerInput) -> FarmerInput:
+    """
+    Canonicalize state/district/market against the location index.
+    Under the strict policy, unknown locations are rejected with suggestions.
+    """
+    if location_index is None:
+        return farmer_input
+
+    resolved = location_index.resolve(farmer_input.state, farmer_input.district, farmer_input.market)
+    if LOCATION_POLICY == "strict":
+        for level in LEVELS:
+            if resolved[level] is None:
+                suggestions = location_index.complete(
+                    getattr(farmer_input, level)[:3], level=level,
+                    state=resolved['state'], district=resolved['district'], limit=5
+                )
+                raise HTTPException(
+                    status_code=400,
+                    detail={
+                        "message": f"Unknown {level}: {getattr(farmer_input, level)}",
+                        "suggestions": [s[level] for s in suggestions],
+                    }
+                )
+
+    corrections = {level: name for level, name in resolved.items() if name is not None}
+    return farmer_input.model_copy(update=corrections)
+
+
+def derive_parameters(farmer_input) -> dict:
+    """Environmental features from measured values or soil/season presets"""
+    if isinstance(farmer_input, SoilTestInput):
+        return {k: round(getattr(farmer_input, k), digits) for k, digits in SOIL_TEST_PRECISION.items()}
+
+    soil = soil_map[farmer_input.soil_type]
+    season = season_map[farmer_input.season]
+    return {
+        "N": soil["N"],
+        "P": soil["P"],
+        "K": soil["K"],
+        "temperature": season["temperature"],
+        "humidity": season["humidity"],
+        "ph": soil["ph"],
+        "rainfall": season["rainfall"]
+    }
+
+
 def safe_encode(encoder, value):
     """Safely encode a value, return None if not found"""
     try:
@@ -151,46 +612,135 @@ def find_price_for_crop(crop_name, avg_prices_by_crop, le_commodity):
     return None
 
 
-def recommend_crops_api(farmer_input: FarmerInput, top_k=3, price_weight=0.6, suit_weight=0.4):
+def encode_location(state, district, market, models=None):
+    """Label-encode state/district/market; unknown names come back as None"""
+    label_encoders = (models or models_dict)['label_encoders']
+    return (
+        safe_encode(label_encoders['state'], state),
+        safe_encode(label_encoders['district'], district),
+        safe_encode(label_encoders['market'], market),
+    )
+
+
+def predict_suitability(env_raw, use_cache=False, models=None):
     """
-    Recommend crops based on suitability and profitability
+    Suitability probabilities for a batch of raw environment rows.
+    With use_cache, rows already scored by this model version are served from
+    its LRU; the rest go through the model in one call and are cached.
+    Returns (probs, sources).
     """
-    # Extract models
-    scaler = models_dict['scaler']
-    label_encoders = models_dict['label_encoders']
-    numeric_cols = models_dict['numeric_cols']
-    suit_model = models_dict['suitability_model']
-    le_crop = models_dict['crop_encoder']
-    price_model = models_dict['price_model']
-    avg_prices_by_crop = models_dict['avg_prices_by_crop']
-    
-    # Get soil and season parameters
-    soil = soil_map[farmer_input.soil_type]
-    season = season_map[farmer_input.season]
-    
-    # Prepare environmental features
-    env_raw = np.array([[
-        soil["N"], soil["P"], soil["K"],
-        season["temperature"], season["humidity"],
-        soil["ph"], season["rainfall"]
-    ]], dtype=float)
-    
-    env_scaled = scaler.transform(env_raw)
-    
-    # Get suitability probabilities for all crops
-    suit_probs = suit_model.predict_proba(env_scaled)[0]
-    crop_classes = le_crop.classes_
-    
-    # Prepare location encoders
-    le_state = label_encoders['state']
-    le_district = label_encoders['district']
-    le_market = label_encoders['market']
+    models = models or models_dict
+    cache = models.get('suitability_cache') if use_cache else None
+    keys = [tuple(row) for row in env_raw.tolist()]
+    probs = [None] * len(keys)
+    sources = ["model"] * len(keys)
+
+    if cache is not None:
+        for i, key in enumerate(keys):
+            probs[i] = cache.get(key)
+            if probs[i] is not None:
+                sources[i] = "cache"
+
+    pending = [i for i, p in enumerate(probs) if p is None]
+    if pending:
+        env_scaled = models['scaler'].transform(env_raw[pending])
+        exact = models['suitability_model'].predict_proba(env_scaled)
+        for i, p in zip(pending, exact):
+            probs[i] = p
+            if cache is not None:
+                cache.put(keys[i], p)
+    return np.vstack(probs), sources
+
+
+def price_crops(crops, locations, models=None):
+    """
+    Price every crop at every encoded (state, district, market) location.
+
+    Fully encoded pairs are predicted by the price model in a single batch;
+    the rest fall back to the most specific rollup, then to the national
+    average. Returns one {crop: (price, level)} dict per location.
+    Fallbacks are logged as one aggregated record per call, not per crop.
+    """
+    models = models or models_dict
+    label_encoders = models['label_encoders']
+    price_model = models['price_model']
+    avg_prices_by_crop = models['avg_prices_by_crop']
     le_commodity = label_encoders['commodity']
-    
-    # Encode user location
-    s_enc = safe_encode(le_state, farmer_input.state)
-    d_enc = safe_encode(le_district, farmer_input.district)
-    m_enc = safe_encode(le_market, farmer_input.market)
+    price_rollup_tables = models['price_rollup_tables']
+    price_radices = models['price_rollups']['radices'] if price_rollup_tables is not None else None
+
+    c_encs = {crop: safe_encode(le_commodity, crop) for crop in crops}
+    prices = [{crop: (None, None) for crop in crops} for _ in locations]
+
+    # Strategy 1: Location-specific price prediction, batched
+    batch = [
+        (i, crop, [s_enc, d_enc, m_enc, c_encs[crop]])
+        for i, (s_enc, d_enc, m_enc) in enumerate(locations)
+        if s_enc is not None and d_enc is not None and m_enc is not None
+        for crop in crops if c_encs[crop] is not None
+    ]
+    if batch:
+        try:
+            predicted = price_model.predict(np.array([row for _, _, row in batch]))
+            for (i, crop, _), price in zip(batch, predicted):
+                prices[i][crop] = (float(price), "model")
+        except Exception as e:
+            logger.debug("Location price prediction failed: %s", e)
+
+    rollup_crops, fallback_crops, unpriced_crops = set(), set(), set()
+
+    for i, (s_enc, d_enc, m_enc) in enumerate(locations):
+        for crop in crops:
+            if prices[i][crop][0] is not None:
+                continue
+
+            # Strategy 2: Most specific precomputed rollup (market -> district -> state -> national)
+            if price_rollup_tables is not None:
+                pred_price, price_level = lookup_rollup_price(
+                    price_rollup_tables, price_radices, s_enc, d_enc, m_enc, c_encs[crop]
+                )
+                if pred_price is not None:
+                    rollup_crops.add(crop)
+                    prices[i][crop] = (pred_price, price_level)
+                    continue
+
+            # Strategy 3: Use improved fallback price lookup
+            pred_price = find_price_for_crop(crop, avg_prices_by_crop, le_commodity)
+            if pred_price:
+                fallback_crops.add(crop)
+                prices[i][crop] = (pred_price, "national")
+            else:
+                unpriced_crops.add(crop)
+
+    if rollup_crops or fallback_crops or unpriced_crops:
+        # Missing prices are a data problem worth seeing at the default level; fallbacks are routine
+        logger.log(
+            logging.WARNING if unpriced_crops else logging.DEBUG,
+            "Price fallbacks for %d location(s): %d rollup, %d national, %d unpriced",
+            len(locations), len(rollup_crops), len(fallback_crops), len(unpriced_crops),
+            extra={
+                "rollup_crops": sorted(rollup_crops),
+                "fallback_crops": sorted(fallback_crops),
+                "unpriced_crops": sorted(unpriced_crops),
+            }
+        )
+
+    return prices
+
+
+def candidate_crops(suit_probs, models=None):
+    """Crops whose suitability clears the minimum threshold in any row"""
+    crop_classes = (models or models_dict)['crop_encoder'].classes_
+    mask = np.atleast_2d(suit_probs).max(axis=0) >= MIN_SUITABILITY
+    return crop_classes[mask].tolist()
+
+
+def score_crops(suit_probs, prices, top_k=3, price_weight=0.6, suit_weight=0.4, models=None):
+    """
+    Combine one row of suitability probabilities with crop prices into the
+    recommendation summary (everything except the environment block).
+    """
+    crop_classes = (models or models_dict)['crop_encoder'].classes_
     
     # Calculate scores for each crop
     results = []
@@ -199,39 +749,17 @@ def recommend_crops_api(farmer_input: FarmerInput, top_k=3, price_weight=0.6, su
         suit_score = float(suit_probs[idx])
         
         # Skip crops with very low suitability
-        if suit_score < 0.01:
+        if suit_score < MIN_SUITABILITY:
             continue
         
-        # Strategy 1: Try location-specific price prediction
-        pred_price = None
-        c_enc = safe_encode(le_commodity, crop)
-        
-        if c_enc is not None and s_enc is not None and d_enc is not None and m_enc is not None:
-            try:
-                X_price = np.array([[s_enc, d_enc, m_enc, c_enc]])
-                pred_price = float(price_model.predict(X_price)[0])
-                logger.debug(f"Location price for {crop}: ₹{pred_price}")
-            except Exception as e:
-                logger.debug(f"Location price prediction failed for {crop}: {e}")
-        
-        # Strategy 2: Use improved fallback price lookup
-        if pred_price is None:
-            pred_price = find_price_for_crop(crop, avg_prices_by_crop, le_commodity)
-            if pred_price:
-                logger.info(f"Using fallback price for {crop}: ₹{pred_price}")
-            else:
-                logger.warning(f"No price found for {crop}")
-        
+        pred_price, price_level = prices[crop]
         results.append({
             "crop": crop,
             "predicted_price": pred_price,
+            "price_level": price_level,
             "suitability_score": suit_score
         })
     
-    # Debug: Log price availability
-    priced_count = sum(1 for r in results if r['predicted_price'] is not None)
-    logger.info(f"Crops with prices: {priced_count}/{len(results)}")
-    
     # Normalize scores and calculate combined score
     if results:
         all_prices = [r['predicted_price'] for r in results if r['predicted_price'] is not None]
@@ -266,6 +794,7 @@ def recommend_crops_api(farmer_input: FarmerInput, top_k=3, price_weight=0.6, su
         top_list.append({
             "crop": item["crop"],
             "predicted_price": round(item["predicted_price"], 2) if item["predicted_price"] is not None else None,
+            "price_level": item["price_level"],
             "suitability_score": round(item["suitability_score"] * 100, 2),  # Convert to percentage
             "combined_score": round(item["combined_score"] * 100, 2)  # Convert to percentage
         })
@@ -277,33 +806,24 @@ def recommend_crops_api(farmer_input: FarmerInput, top_k=3, price_weight=0.6, su
     priced_results = [r for r in results if r['predicted_price'] is not None]
     most_profitable = None
     most_profitable_price = None
+    most_profitable_level = None
     
     if priced_results:
         most_profitable_crop = max(priced_results, key=lambda r: r['combined_score'])
         most_profitable = most_profitable_crop['crop']
         most_profitable_price = most_profitable_crop['predicted_price']
+        most_profitable_level = most_profitable_crop['price_level']
+    
+    price_levels = {}
+    for r in priced_results:
+        price_levels[r['price_level']] = price_levels.get(r['price_level'], 0) + 1
     
     return {
         "suitable_crop": best_by_suit["crop"],
         "most_profitable_crop": most_profitable if most_profitable else best_by_suit["crop"],
         "most_profitable_price": round(most_profitable_price, 2) if most_profitable_price else None,
+        "most_profitable_price_level": most_profitable_level,
         "top_3": top_list,
-        "environment": {
-            "soil_type": farmer_input.soil_type,
-            "season": farmer_input.season,
-            "state": farmer_input.state,
-            "district": farmer_input.district,
-            "market": farmer_input.market,
-            "derived_parameters": {
-                "N": soil["N"],
-                "P": soil["P"],
-                "K": soil["K"],
-                "temperature": season["temperature"],
-                "humidity": season["humidity"],
-                "ph": soil["ph"],
-                "rainfall": season["rainfall"]
-            }
-        },
         "scoring_weights": {
             "price_weight": price_weight,
             "suitability_weight": suit_weight
@@ -311,16 +831,341 @@ def recommend_crops_api(farmer_input: FarmerInput, top_k=3, price_weight=0.6, su
         "debug_info": {
             "total_crops_evaluated": len(results),
             "crops_with_prices": len(priced_results),
-            "crops_without_prices": len(results) - len(priced_results)
+            "crops_without_prices": len(results) - len(priced_results),
+            "price_levels": price_levels
         }
     }
 
 
+def recommend_crops_api(farmer_input: FarmerInput, top_k=3, price_weight=0.6, suit_weight=0.4,
+                        use_cache=False, models=None):
+    """
+    Recommend crops based on suitability and profitability.
+    With use_cache, suitability for inputs this model version has already
+    scored comes from its LRU instead of the model.
+    `models` selects a registry version's bundle (default: the active one).
+    """
+    models = models or models_dict
+    # Get soil and season parameters
+    params = derive_parameters(farmer_input)
+    
+    # Prepare environmental features
+    env_raw = np.array([[params[col] for col in models['numeric_cols']]], dtype=float)
+    
+    # Get suitability probabilities for all crops
+    suit_probs, sources = predict_suitability(env_raw, use_cache=use_cache, models=models)
+    suit_probs = suit_probs[0]
+    
+    # Price the crops worth scoring at the user's location
+    location = encode_location(farmer_input.state, farmer_input.district, farmer_input.market, models=models)
+    prices = price_crops(candidate_crops(suit_probs, models=models), [location], models=models)[0]
+    
+    result = score_crops(suit_probs, prices, top_k=top_k, price_weight=price_weight, suit_weight=suit_weight,
+                         models=models)
+    result["environment"] = {
+        "soil_type": getattr(farmer_input, "soil_type", None),
+        "season": getattr(farmer_input, "season", None),
+        "state": farmer_input.state,
+        "district": farmer_input.district,
+        "market": farmer_input.market,
+        "derived_parameters": params
+    }
+    result["debug_info"]["suitability_source"] = sources[0]
+    return result
+
+
+# ---------- Bulk Scoring ----------
+BULK_COLUMNS = ["soil_type", "season", "state", "district", "market"]
+BULK_CHUNK_SIZE = 500
+BULK_CSV_FIELDS = [
+    "row", "status", "error", "suitable_crop", "most_profitable_crop", "most_profitable_price",
+    "crop_1", "price_1", "crop_2", "price_2", "crop_3", "price_3",
+]
+MAX_BULK_JOBS = 100
+bulk_jobs: "OrderedDict[str, dict]" = OrderedDict()
+
+
+def _bulk_summary(result: dict) -> dict:
+    """Fields of a recommendation kept in bulk output"""
+    return {
+        "suitable_crop": result["suitable_crop"],
+        "most_profitable_crop": result["most_profitable_crop"],
+        "most_profitable_price": result["most_profitable_price"],
+        "most_profitable_price_level": result["most_profitable_price_level"],
+        "top_3": result["top_3"],
+    }
+
+
+def _parse_bulk_row(raw: dict) -> FarmerInput:
+    """Turn one CSV row into a validated, location-corrected FarmerInput"""
+    values = {k: (raw.get(k) or "").strip() for k in BULK_COLUMNS}
+    missing = [k for k, v in values.items() if not v]
+    if missing:
+        raise ValueError(f"Missing value(s) for: {', '.join(missing)}")
+
+    farmer_input = FarmerInput(**values)
+    validate_inputs(farmer_input)
+    return resolve_location(farmer_input)
+
+
+def _score_inputs(inputs: list) -> list:
+    """Score many FarmerInputs with one suitability and one price batch"""
+    # Distinct environments and locations, in first-seen order
+    envs = {}
+    locations = {}
+    for fi in inputs:
+        envs.setdefault((fi.soil_type, fi.season), fi)
+        locations.setdefault((fi.state, fi.district, fi.market), len(locations))
+    env_index = {key: i for i, key in enumerate(envs)}
+
+    env_raw = np.array([
+        [derive_parameters(fi)[col] for col in models_dict['numeric_cols']]
+        for fi in envs.values()
+    ], dtype=float)
+    suit_probs, _ = predict_suitability(env_raw)
+    prices = price_crops(candidate_crops(suit_probs), [encode_location(*loc) for loc in locations])
+
+    return [
+        _bulk_summary(score_crops(
+            suit_probs[env_index[(fi.soil_type, fi.season)]],
+            prices[locations[(fi.state, fi.district, fi.market)]]
+        ))
+        for fi in inputs
+    ]
+
+
+def score_bulk_chunk(rows: list) -> list:
+    """
+    Score a chunk of (row_number, csv_row) pairs. Invalid or unreadable rows
+    become error records; if the batched scoring itself fails, rows are retried one at a
+    time so a single bad row cannot take the chunk down with it.
+    """
+    records = {}
+    valid = []
+    for row_num, raw in rows:
+        if isinstance(raw, Exception):
+            records[row_num] = {"row": row_num, "status": "error", "error": str(raw)}
+            continue
+        try:
+            valid.append((row_num, _parse_bulk_row(raw)))
+        except HTTPException as e:
+            records[row_num] = {"row": row_num, "status": "error", "error": str(e.detail)}
+        except (ValueError, ValidationError) as e:
+            records[row_num] = {"row": row_num, "status": "error", "error": str(e)}
+
+    if valid:
+        try:
+            scored = _score_inputs([fi for _, fi in valid])
+        except Exception:
+            scored = []
+            for _, fi in valid:
+                try:
+                    scored.append(_score_inputs([fi])[0])
+                except Exception as e:
+                    scored.append(e)
+        for (row_num, _), result in zip(valid, scored):
+            if isinstance(result, Exception):
+                records[row_num] = {"row": row_num, "status": "error", "error": f"Scoring failed: {result}"}
+            else:
+                records[row_num] = {"row": row_num, "status": "ok", **result}
+
+    return [records[row_num] for row_num, _ in rows]
+
+
+def _bulk_csv_line(record: dict) -> str:
+    """Flatten one bulk record into a CSV line"""
+    flat = {k: record.get(k) for k in BULK_CSV_FIELDS[:6]}
+    for i, item in enumerate(record.get("top_3", []), start=1):
+        flat[f"crop_{i}"] = item["crop"]
+        flat[f"price_{i}"] = item["predicted_price"]
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, fieldnames=BULK_CSV_FIELDS).writerow(flat)
+    return buffer.getvalue()
+
+
+def new_bulk_job(source: str) -> dict:
+    """Register a bulk job for the status endpoint, evicting the oldest"""
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "source": source,
+        "status": "running",
+        "rows_processed": 0,
+        "rows_ok": 0,
+        "rows_failed": 0,
+        "chunks": 0,
+        "started_at": time.time(),
+        "finished_at": None,
+        "error": None,
+    }
+    bulk_jobs[job["job_id"]] = job
+    while len(bulk_jobs) > MAX_BULK_JOBS:
+        bulk_jobs.popitem(last=False)
+    return job
+
+
+def _decoded_lines(stream, decode_errors: list):
+    """Decode a binary stream line by line; undecodable bytes are replaced and recorded"""
+    encoding = "utf-8-sig"
+    for line in stream:
+        try:
+            yield line.decode(encoding)
+        except UnicodeDecodeError as e:
+            decode_errors.append(e)
+            yield line.decode(encoding, errors="replace")
+        encoding = "utf-8"
+
+
+def _bulk_rows(reader, fieldnames: list, decode_errors: list):
+    """(row_number, row) pairs; rows that cannot be read come through as a ValueError"""
+    row_num = 0
+    while True:
+        try:
+            values = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            values = ValueError(f"Unreadable row (line {reader.line_num}): {e}")
+        if values == [] and not decode_errors:
+            continue
+        row_num += 1
+        if decode_errors:
+            decode_errors.clear()
+            values = ValueError(f"Row is not valid UTF-8 (line {reader.line_num})")
+        elif not isinstance(values, Exception):
+            values = dict(zip(fieldnames, values))
+        yield row_num, values
+
+
+def open_bulk_reader(stream):
+    """
+    (row_number, row) pairs for a farmer CSV read from a binary stream.
+    A row with undecodable bytes or an unreadable field becomes an error for
+    that row only; fails fast if the header is unreadable or required
+    columns are missing.
+    """
+    decode_errors = []
+    reader = csv.reader(_decoded_lines(stream, decode_errors))
+    try:
+        fieldnames = next(reader, None) or []
+    except csv.Error as e:
+        raise ValueError(f"Unreadable CSV header: {e}")
+    if decode_errors:
+        raise ValueError("CSV header is not valid UTF-8")
+    missing = [c for c in BULK_COLUMNS if c not in fieldnames]
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(missing)}")
+    return _bulk_rows(reader, fieldnames, decode_errors)
+
+
+def stream_bulk_scores(rows, output_format: str = "ndjson",
+                       chunk_size: int = BULK_CHUNK_SIZE, job: Optional[dict] = None):
+    """
+    Yield scored output (NDJSON or CSV) for open_bulk_reader's rows one chunk
+    at a time. Only one chunk is held in memory. If the consumer stops early
+    (client disconnect), the job is marked cancelled.
+    """
+    job = job if job is not None else new_bulk_job("<stream>")
+    try:
+        if output_format == "csv":
+            yield ",".join(BULK_CSV_FIELDS) + "\n"
+
+        while chunk := list(islice(rows, chunk_size)):
+            records = score_bulk_chunk(chunk)
+            failed = sum(1 for r in records if r["status"] == "error")
+            job["rows_processed"] += len(records)
+            job["rows_failed"] += failed
+            job["rows_ok"] += len(records) - failed
+            job["chunks"] += 1
+
+            if output_format == "csv":
+                yield "".join(_bulk_csv_line(r) for r in records)
+            else:
+                yield "".join(json.dumps(r, separators=(',', ':')) + "\n" for r in records)
+
+        job["status"] = "completed"
+    except GeneratorExit:
+        job["status"] = "cancelled"
+        logger.warning("Bulk job %s cancelled after %d rows", job['job_id'], job['rows_processed'])
+        raise
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+        logger.error("Bulk job %s failed: %s", job['job_id'], e)
+        if output_format == "csv":
+            yield _bulk_csv_line({"row": None, "status": "error", "error": str(e)})
+        else:
+            yield json.dumps({"row": None, "status": "error", "error": str(e)}) + "\n"
+    finally:
+        job["finished_at"] = time.time()
+
+
+def record_history(farmer_input, result: dict):
+    """Hand a recommendation to the write-behind sink; never blocks"""
+    if history_sink is not None:
+        history_sink.submit(history_record(farmer_input, result))
+
+
+def log_prediction(message: str, farmer_input, result: dict, started: float):
+    """One structured record per request, carrying the aggregated diagnostics"""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    debug_info = result["debug_info"]
+    logger.info(
+        message, farmer_input.state, farmer_input.district,
+        extra={
+            "market": farmer_input.market,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "crops_evaluated": debug_info["total_crops_evaluated"],
+            "crops_without_prices": debug_info["crops_without_prices"],
+            "price_levels": debug_info["price_levels"],
+            "suitability_source": debug_info.get("suitability_source"),
+        }
+    )
+
+
+def _shadow_score(farmer_input, use_cache: bool, served: ModelVersion, shadow: ModelVersion, served_result: dict):
+    """Score the same request with the other version and record how closely the two agree"""
+    started = time.perf_counter()
+    result = recommend_crops_api(farmer_input, top_k=3, price_weight=0.6, suit_weight=0.4,
+                                 use_cache=use_cache, models=shadow.models)
+    shadow.latency["shadow"].observe((time.perf_counter() - started) * 1000)
+
+    served_top = [c["crop"] for c in served_result["top_3"]]
+    shadow_top = [c["crop"] for c in result["top_3"]]
+    # Agreement is tracked on whichever of the two is not the active version
+    compared = shadow if served is model_registry.active else served
+    compared.record_agreement(
+        served_top[:1] == shadow_top[:1],
+        len(set(served_top) & set(shadow_top)) / max(len(served_top), 1),
+    )
+
+
+def serve_recommendation(farmer_input, use_cache: bool = False):
+    """
+    Score with the version the registry routes this request to. When a
+    candidate is involved, the other version is scored on the shadow thread
+    after the response is computed. Returns (result, version).
+    """
+    served, shadow = model_registry.route()
+    started = time.perf_counter()
+    result = recommend_crops_api(farmer_input, top_k=3, price_weight=0.6, suit_weight=0.4,
+                                 use_cache=use_cache, models=served.models)
+    served.latency["served"].observe((time.perf_counter() - started) * 1000)
+    if shadow is not None:
+        model_registry.submit_shadow(lambda: _shadow_score(farmer_input, use_cache, served, shadow, result))
+    return result, served
+
+
 # ---------- Prediction Endpoint ----------
 @app.post("/predict", 
     summary="Get Crop Recommendations",
-    description="Returns top 3 crop recommendations based on soil type, season, and location")
-async def predict_crop(farmer_input: FarmerInput):
+    description="Returns top 3 crop recommendations based on soil type, season, and location",
+    response_model=PredictionResponse)
+async def predict_crop(
+    farmer_input: FarmerInput,
+    fields: Optional[str] = Query(None, description="Comma-separated top-level fields to return"),
+    compact: bool = Query(False, description="Drop the environment and debug_info blocks"),
+):
     """
     Predict the most suitable and profitable crops based on:
     - Soil type (Loamy, Clay, Sandy, Black)
@@ -334,28 +1179,192 @@ async def predict_crop(farmer_input: FarmerInput):
             detail="Models not loaded. Please contact the administrator."
         )
     
+    wanted = parse_fields(fields)
+    started = time.perf_counter()
     try:
         # Validate inputs
         validate_inputs(farmer_input)
+        farmer_input = resolve_location(farmer_input)
         
         # Get recommendations
-        result = recommend_crops_api(
-            farmer_input, 
-            top_k=3, 
-            price_weight=0.6, 
-            suit_weight=0.4
+        result, version = serve_recommendation(farmer_input)
+        
+        log_prediction("Prediction successful for %s - %s", farmer_input, result, started)
+        record_history(farmer_input, result)
+        return prediction_response(result, wanted, compact, version)
+        
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error("Prediction error: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@app.post("/predict/soil-test",
+    summary="Get Crop Recommendations from Soil Test Values",
+    description="Returns top 3 crop recommendations from measured N, P, K, pH and weather values",
+    response_model=PredictionResponse)
+async def predict_crop_soil_test(
+    soil_input: SoilTestInput,
+    fields: Optional[str] = Query(None, description="Comma-separated top-level fields to return"),
+    compact: bool = Query(False, description="Drop the environment and debug_info blocks"),
+):
+    """
+    Like /predict, but with measured values instead of soil/season presets.
+    Readings are rounded to soil-test reporting precision, so repeated
+    readings are served from the model version's suitability cache.
+    """
+    if models_dict is None:
+        raise HTTPException(
+            status_code=503, 
+            detail="Models not loaded. Please contact the administrator."
         )
+    
+    try:
+        validate_user_input(soil_input.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    wanted = parse_fields(fields)
+    
+    started = time.perf_counter()
+    try:
+        soil_input = resolve_location(soil_input)
+        result, version = serve_recommendation(soil_input, use_cache=True)
         
-        logger.info(f"Prediction successful for {farmer_input.state} - {farmer_input.district}")
-        return result
+        log_prediction("Soil-test prediction successful for %s - %s", soil_input, result, started)
+        record_history(soil_input, result)
+        return prediction_response(result, wanted, compact, version)
         
     except HTTPException as he:
         raise he
     except Exception as e:
-        logger.error(f"Prediction error: {str(e)}", exc_info=True)
+        logger.error("Prediction error: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+# ---------- Price Query Endpoint ----------
+@app.get("/prices",
+    summary="Query Market Prices",
+    description="Filter, sort and paginate mandi price records by state, district, market and commodity")
+async def get_prices(
+    request: Request,
+    state: Optional[str] = None,
+    district: Optional[str] = None,
+    market: Optional[str] = None,
+    commodity: Optional[str] = None,
+    sort_by: Optional[str] = Query(None, description=f"One of: {', '.join(SORT_FIELDS)}"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PRICE_PAGE_SIZE),
+):
+    """
+    Server-side replacement for downloading and parsing crop_price.csv in the browser.
+    Responses carry an ETag; send it back as If-None-Match to get a 304.
+    """
+    if price_index is None:
+        raise HTTPException(status_code=503, detail="Price data not loaded")
+
+    params = {
+        "state": state, "district": district, "market": market, "commodity": commodity,
+        "sort_by": sort_by, "order": order, "offset": offset, "limit": limit,
+    }
+    headers = cache_headers(price_index.etag(params), PRICE_CACHE_MAX_AGE)
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        result = price_index.query(**params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return JSONResponse(content=result, headers=headers)
+
+
+# ---------- Location Endpoints ----------
+@app.get("/locations",
+    summary="Location Hierarchy",
+    description="Full State -> District -> Market hierarchy known to the price data")
+async def get_locations(request: Request):
+    """Compact hierarchy for populating location dropdowns; cached by ETag"""
+    if location_index is None:
+        raise HTTPException(status_code=503, detail="Location data not loaded")
+
+    headers = cache_headers(location_index.etag, PRICE_CACHE_MAX_AGE)
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(
+        content={"version": location_index.version, "states": location_index.hierarchy},
+        headers=headers
+    )
+
+
+@app.get("/locations/autocomplete",
+    summary="Location Autocomplete",
+    description="Prefix search over states, districts or markets")
+async def autocomplete_locations(
+    q: str = Query(..., min_length=1),
+    level: str = Query("market", pattern="^(state|district|market)$"),
+    state: Optional[str] = None,
+    district: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Suggest names at a level, optionally restricted to a state and district"""
+    if location_index is None:
+        raise HTTPException(status_code=503, detail="Location data not loaded")
+
+    return {
+        "query": q,
+        "level": level,
+        "suggestions": location_index.complete(q, level=level, state=state, district=district, limit=limit),
+    }
+
+
+# ---------- Bulk Scoring Endpoints ----------
+@app.post("/bulk/score",
+    summary="Bulk Crop Recommendations",
+    description="Upload a CSV of soil_type, season, state, district, market rows; results stream back as NDJSON or CSV")
+async def bulk_score(
+    file: UploadFile = File(...),
+    output_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=10000),
+):
+    """
+    Stream recommendations for every row of the uploaded CSV. Malformed or
+    unreadable rows produce an error record instead of aborting the run. Poll
+    /bulk/jobs/{job_id} (id in the X-Job-Id header) for progress.
+    """
+    if models_dict is None:
+        raise HTTPException(status_code=503, detail="Models not loaded")
+
+    try:
+        rows = open_bulk_reader(file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job = new_bulk_job(file.filename or "<upload>")
+    media_type = "text/csv" if output_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_bulk_scores(rows, output_format, chunk_size, job),
+        media_type=media_type,
+        headers={"X-Job-Id": job["job_id"]}
+    )
+
+
+@app.get("/bulk/jobs/{job_id}", summary="Bulk Job Status")
+async def bulk_job_status(job_id: str):
+    """Progress counters for a bulk scoring job"""
+    job = bulk_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+
+    elapsed = (job["finished_at"] or time.time()) - job["started_at"]
+    return {
+        **job,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(job["rows_processed"] / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
 # ---------- Health Check ----------
 @app.get("/health", summary="Health Check")
 async def health_check():
@@ -364,18 +1373,111 @@ async def health_check():
         "status": "healthy" if models_dict is not None else "unhealthy",
         "models_loaded": models_dict is not None,
         "version": "2.0",
-        "model_path": str(MODEL_PATH),
+        "model_path": str(loaded_model_path or MODEL_PATH),
+        "model_version": model_registry.active.name if model_registry.active else None,
         "model_load_error": model_load_error,
+        "price_index_loaded": price_index is not None,
+        "logging": logging_stats(),
+        "history": history_sink.snapshot() if history_sink is not None else None,
+        "suitability_cache": models_dict['suitability_cache'].snapshot() if models_dict is not None else None,
     }
 
 
+# ---------- Model Registry ----------
+@app.get("/models", summary="Loaded Model Versions", dependencies=[Depends(require_admin)])
+async def list_models():
+    """Active/candidate versions, routing, per-version latency histograms and agreement rates"""
+    return model_registry.snapshot()
+
+
+@app.post("/models/load", summary="Load a Model Version", dependencies=[Depends(require_admin)])
+async def load_model_version(request: ModelLoadRequest):
+    """Load a bundle from MODELS_DIR and register it (it serves nothing until made candidate or promoted)"""
+    if model_registry.active is not None and request.name == model_registry.active.name:
+        raise HTTPException(status_code=400, detail=f"'{request.name}' is the active version")
+    path = resolve_bundle_path(request.bundle)
+    try:
+        loaded = await run_in_threadpool(joblib.load, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model file not found: {request.bundle}")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not load model file: {e}")
+    try:
+        version = model_registry.register(request.name, prepare_models(loaded), str(path))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return version.snapshot()
+
+
+@app.delete("/models/{name}", summary="Unload a Model Version", dependencies=[Depends(require_admin)])
+async def unload_model_version(name: str):
+    """Drop a version that is neither active nor candidate, freeing its models"""
+    try:
+        model_registry.unregister(name)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info("Model version '%s' unloaded", name)
+    return model_registry.snapshot()
+
+
+@app.post("/models/candidate", summary="Set the Candidate Version", dependencies=[Depends(require_admin)])
+async def set_candidate(config: CandidateConfig):
+    """Route a fraction of /predict traffic to (split) or alongside (shadow) a registered version"""
+    if config.mode not in ROUTING_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode. Must be one of: {', '.join(ROUTING_MODES)}")
+    try:
+        model_registry.set_candidate(config.name, config.fraction, config.mode)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return model_registry.snapshot()
+
+
+@app.post("/models/promote", summary="Promote a Version", dependencies=[Depends(require_admin)])
+async def promote_model(name: Optional[str] = Query(None, description="Version to promote (default: the candidate)")):
+    """Make a version active; the previous active version becomes the rollback target"""
+    try:
+        version = model_registry.promote(name)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    activate_version(version)
+    logger.info("Model version '%s' promoted", version.name)
+    return model_registry.snapshot()
+
+
+@app.post("/models/rollback", summary="Roll Back to the Previous Version", dependencies=[Depends(require_admin)])
+async def rollback_model():
+    try:
+        version = model_registry.rollback()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    activate_version(version)
+    logger.warning("Model version rolled back to '%s'", version.name)
+    return model_registry.snapshot()
+
+
 # ---------- Model Info ----------
-@app.get("/model-info", summary="Model Information")
+@app.get("/model-info", summary="Model Information", response_model=ModelInfoResponse)
 async def model_info():
-    """Get information about loaded models"""
+    """Get information about loaded models (rendered once per model load)"""
+    global model_info_body
     if models_dict is None:
         raise HTTPException(status_code=503, detail="Models not loaded")
     
+    if model_info_body is None:
+        info = build_model_info()
+        if VALIDATE_RESPONSES:
+            ModelInfoResponse.model_validate(info)
+        model_info_body = FastJSONResponse(info).body
+    return Response(content=model_info_body, media_type="application/json")
+
+
+def build_model_info() -> dict:
     return {
         "suitability_model": type(models_dict['suitability_model']).__name__,
         "price_model": type(models_dict['price_model']).__name__,
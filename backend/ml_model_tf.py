@@ -12,10 +12,18 @@ from sklearn.ensemble import (
 from sklearn.linear_model import Ridge
 from sklearn.metrics import accuracy_score, mean_absolute_error, r2_score
 import joblib
+import copy
 import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import warnings
 warnings.filterwarnings('ignore')
 
+from compact_trees import compact_model
+from training_cache import TrainingCache, TRAINING_CACHE_DIR, file_digest, file_stamp
+from training_profiler import StageProfiler
+
 
 def augment_suitability_data(crop_suitable, crop_price, min_samples=2):
     """
@@ -172,66 +180,316 @@ def validate_user_input(user_input):
     return True
 
 
-def train_model():
-    print("=" * 60)
-    print("🌾 CROP RECOMMENDATION MODEL TRAINING")
-    print("=" * 60)
-    
-    # 1️⃣ Load datasets
-    print("\n📂 Loading datasets...")
-    crop_price = pd.read_csv("crop_price.csv")
-    crop_suitable_raw = pd.read_csv("crop_suitable.csv")
-    
+ROLLUP_LEVELS = {
+    'market': ['state', 'district', 'market', 'commodity'],
+    'district': ['state', 'district', 'commodity'],
+    'state': ['state', 'commodity'],
+    'national': ['commodity'],
+}
+
+
+def pack_key(codes, radices):
+    """Pack a tuple of label-encoded values into one integer (mixed radix)"""
+    key = 0
+    for code, radix in zip(codes, radices):
+        key = key * radix + int(code)
+    return key
+
+
+def build_price_rollups(crop_price, label_encoders):
+    """
+    Precompute mean price per commodity at market, district, state and
+    national level. Each level is stored as parallel arrays of packed
+    integer keys (int64) and prices (float32).
+    """
+    encoded = pd.DataFrame({
+        col: label_encoders[col].transform(crop_price[col].astype(str))
+        for col in ['state', 'district', 'market', 'commodity']
+    })
+    encoded['price'] = crop_price['price'].to_numpy()
+
+    sizes = {col: len(le.classes_) for col, le in label_encoders.items()}
+    rollups = {'radices': sizes, 'levels': {}}
+
+    for level, cols in ROLLUP_LEVELS.items():
+        grouped = encoded.groupby(cols)['price'].mean()
+        codes = np.array(grouped.index.tolist(), dtype=np.int64).reshape(len(grouped), len(cols))
+        keys = np.zeros(len(grouped), dtype=np.int64)
+        for i, col in enumerate(cols):
+            keys = keys * sizes[col] + codes[:, i]
+        rollups['levels'][level] = {
+            'keys': keys,
+            'values': grouped.to_numpy(dtype=np.float32),
+        }
+        print(f"   • {level}: {len(keys)} entries")
+
+    return rollups
+
+
+def load_rollup_tables(rollups):
+    """Turn stored rollup arrays into per-level dicts for O(1) lookups"""
+    return {
+        level: dict(zip(table['keys'].tolist(), table['values'].tolist()))
+        for level, table in rollups['levels'].items()
+    }
+
+
+def lookup_rollup_price(tables, radices, s_enc, d_enc, m_enc, c_enc):
+    """
+    Return (price, level) for the most specific level available for the
+    given encodings, or (None, None). Any of s/d/m may be None.
+    """
+    if c_enc is None:
+        return None, None
+
+    codes = {'state': s_enc, 'district': d_enc, 'market': m_enc, 'commodity': c_enc}
+    for level, cols in ROLLUP_LEVELS.items():
+        if any(codes[col] is None for col in cols):
+            continue
+        price = tables[level].get(pack_key([codes[c] for c in cols], [radices[c] for c in cols]))
+        if price is not None:
+            return price, level
+    return None, None
+
+
+def subforest(forest, n_estimators):
+    """The first `n_estimators` trees of a fitted forest as a forest of its own (trees are shared)"""
+    student = copy.copy(forest)
+    student.estimators_ = forest.estimators_[:n_estimators]
+    student.n_estimators = len(student.estimators_)
+    return student
+
+
+def distill_suitability_model(teacher, X_holdout, tolerance=0.15, error_percentile=95,
+                              min_top1_agreement=0.95, min_top3_agreement=0.98, candidates=(25, 50, 100)):
+    """
+    Find the smallest sub-forest of the teacher that reproduces it on
+    held-out rows. Each tree of a random forest is an independent bootstrap
+    fit, so the first n trees are an unbiased, n/N-sized version of it.
+
+    A student is accepted only if, on held-out rows:
+    - the `error_percentile` percentile of the per-row max probability
+      error is within `tolerance` (100 gates on the worst row);
+    - it picks the teacher's top crop for at least `min_top1_agreement`;
+    - the teacher's top crop is in its top 3 for at least `min_top3_agreement`.
+    Candidates are tree counts tried in order. Returns (model or None, stats).
+    """
+    teacher_probs = teacher.predict_proba(X_holdout)
+    teacher_top1 = teacher_probs.argmax(axis=1)
+
+    results = []
+    for n_estimators in candidates:
+        if n_estimators >= len(teacher.estimators_):
+            break
+        student = subforest(teacher, n_estimators)
+        student_probs = student.predict_proba(X_holdout)
+        student_top3 = np.argsort(-student_probs, axis=1)[:, :3]
+
+        row_error = np.abs(student_probs - teacher_probs).max(axis=1)
+        stats = {
+            'n_estimators': n_estimators,
+            'mean_max_error': float(row_error.mean()),
+            'percentile_max_error': float(np.percentile(row_error, error_percentile)),
+            'worst_max_error': float(row_error.max()),
+            'top1_agreement': float((student_top3[:, 0] == teacher_top1).mean()),
+            'top3_agreement': float((student_top3 == teacher_top1[:, None]).any(axis=1).mean()),
+            'nodes': int(sum(e.tree_.node_count for e in student.estimators_)),
+        }
+        stats['accepted'] = (stats['percentile_max_error'] <= tolerance
+                             and stats['top1_agreement'] >= min_top1_agreement
+                             and stats['top3_agreement'] >= min_top3_agreement)
+        results.append(stats)
+        if stats['accepted']:
+            break
+
+    accepted = next((r for r in results if r['accepted']), None)
+    summary = {'tolerance': tolerance, 'error_percentile': error_percentile,
+               'min_top1_agreement': min_top1_agreement, 'min_top3_agreement': min_top3_agreement,
+               'teacher_nodes': int(sum(e.tree_.node_count for e in teacher.estimators_)),
+               'holdout_rows': len(X_holdout), 'accepted': accepted, 'candidates': results}
+    return (student if accepted else None), summary
+
+
+def run_record_path(models_path):
+    """Sidecar next to a saved bundle naming the training run that wrote it"""
+    return f"{models_path}.run.json"
+
+
+def write_run_record(models_path, run_id):
+    """Record the run id with the saved bundle's size and mtime; returns the stamp"""
+    stamp = file_stamp(models_path)
+    tmp = f"{run_record_path(models_path)}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({'run_id': run_id, **stamp}, f)
+    os.replace(tmp, run_record_path(models_path))
+    return stamp
+
+
+def compact_is_current(compact_info, models_path):
+    """
+    Whether a compact bundle was made from the bundle now at `models_path`,
+    without reading that bundle: by run id when the sidecar still describes
+    the file, otherwise by the size and mtime recorded at save time.
+    """
+    stamp = file_stamp(models_path)
+    try:
+        with open(run_record_path(models_path)) as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        record = {}
+    if record.get('size') == stamp['size'] and record.get('mtime_ns') == stamp['mtime_ns']:
+        return record.get('run_id') is not None and record['run_id'] == compact_info.get('source_run')
+    return compact_info.get('source_stamp') == stamp
+
+
+def save_compact_models(bundle, path, X_suit, X_price, source_run=None, source_stamp=None, compress=3,
+                        proba_tolerance=1e-3, price_tolerance=1e-4):
+    """
+    Write `bundle` with its tree models replaced by compact_trees equivalents
+    (narrow indices, float32 thresholds/values, sparse float16 leaf
+    probabilities) and zlib compression. The run id and file_stamp of the
+    saved original bundle are stored so loaders can tell a compact file
+    left over from an earlier training run (see compact_is_current).
+
+    Before writing, both compact models are checked against the originals on
+    the given rows: suitability probabilities must agree within
+    `proba_tolerance`, prices within `price_tolerance` relative error.
+    """
+    compact = dict(bundle)
+    compact['suitability_model'] = compact_model(bundle['suitability_model'])
+    compact['price_model'] = compact_model(bundle['price_model'])
+    if bundle.get('suitability_model_distilled') is not None:
+        compact['suitability_model_distilled'] = compact_model(bundle['suitability_model_distilled'])
+
+    proba_error = float(np.abs(
+        compact['suitability_model'].predict_proba(X_suit) - bundle['suitability_model'].predict_proba(X_suit)
+    ).max())
+    reference = bundle['price_model'].predict(X_price)
+    price_error = float((
+        np.abs(compact['price_model'].predict(X_price) - reference) / np.maximum(np.abs(reference), 1.0)
+    ).max())
+    if proba_error > proba_tolerance or price_error > price_tolerance:
+        raise ValueError(f"Compact models diverge from the originals: suitability max error {proba_error:.2e}, "
+                         f"price max relative error {price_error:.2e}")
+
+    compact['compact'] = {
+        'suitability_max_error': proba_error,
+        'price_max_relative_error': price_error,
+        'checked_rows': {'suitability': len(X_suit), 'price': len(X_price)},
+        'source_run': source_run,
+        'source_stamp': source_stamp,
+    }
+    tmp = f"{path}.tmp"
+    joblib.dump(compact, tmp, compress=compress)
+    os.replace(tmp, path)
+    return compact['compact']
+
+
+NUMERIC_COLS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+AUGMENT_MIN_SAMPLES = 2
+
+SUITABILITY_PARAMS = {
+    'n_estimators': 200,
+    'max_depth': 20,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+    'class_weight': 'balanced',
+    'random_state': 42,
+}
+
+# Acceptance criteria for the distilled suitability model (it replaces the forest in serving)
+DISTILL_PARAMS = {
+    'tolerance': 0.15,
+    'error_percentile': 95,
+    'min_top1_agreement': 0.95,
+    'min_top3_agreement': 0.98,
+    'candidates': (25, 50, 100),
+}
+
+PRICE_MODEL_PARAMS = {
+    'rf': {'n_estimators': 100, 'max_depth': 15, 'random_state': 42},
+    'gb': {'n_estimators': 100, 'max_depth': 5, 'learning_rate': 0.1, 'random_state': 42},
+    'ridge': {'alpha': 1.0},
+}
+
+
+def make_suitability_model(params=SUITABILITY_PARAMS, n_jobs=1):
+    return RandomForestClassifier(**params, n_jobs=n_jobs)
+
+
+def make_price_model(params=PRICE_MODEL_PARAMS, n_jobs=1):
+    """
+    VotingRegressor over a random forest, gradient boosting and ridge using
+    at most n_jobs cores: with more than one, gradient boosting is fitted
+    on its own core beside the forest, which gets the rest.
+    """
+    return VotingRegressor(
+        estimators=[
+            ('rf', RandomForestRegressor(**params['rf'], n_jobs=max(1, n_jobs - 1))),
+            ('gb', GradientBoostingRegressor(**params['gb'])),
+            ('ridge', Ridge(**params['ridge'])),
+        ],
+        n_jobs=min(n_jobs, 2)
+    )
+
+
+def branch_jobs(cpu_count=None):
+    """Cores for the (suitability, price) branches; the larger forest gets the larger share"""
+    cpus = cpu_count or os.cpu_count() or 1
+    suit_jobs = max(1, (cpus + 1) // 2)
+    return suit_jobs, max(1, cpus - suit_jobs)
+
+
+def run_stage(cache, profiler, stages, name, key, compute):
+    """Run one training stage through the cache and record whether it was reused"""
+    with profiler.stage(name) as record:
+        value, cached = cache.get_or_compute(name, key, compute)
+        record['cached'] = cached
+    stages[name] = {'key': key, 'cached': cached}
+    if cached:
+        print(f"   ♻️  {name}: reused cached result {key[:8]}")
+    return value
+
+
+def prepare_suitability_data(crop_suitable_raw, crop_price):
+    """Augmented, scaled suitability features with encoded labels"""
     # 🔧 AUGMENT DATA - Add all crops from price data (before renaming)
-    crop_suitable = augment_suitability_data(crop_suitable_raw, crop_price, min_samples=2)
-    
-    # Clean column names in price data
-    crop_price.rename(columns={
-        'State': 'state',
-        'District': 'district',
-        'Market': 'market',
-        'Commodity': 'commodity',
-        'Modal_x0020_Price': 'price'
-    }, inplace=True)
-    
-    crop_price = crop_price.dropna(subset=['price'])
-    crop_price['price'] = pd.to_numeric(crop_price['price'], errors='coerce')
-    crop_price = crop_price.dropna(subset=['price'])
-    
-    # 2️⃣ Average price per crop
-    print("\n🧹 Processing price data...")
-    avg_price = crop_price.groupby(['state', 'district', 'market', 'commodity'])['price'].mean().reset_index()
-    avg_prices_by_crop = crop_price.groupby('commodity')['price'].mean().to_dict()
-    
-    # 3️⃣ Encode categorical columns for price model
-    print("🔢 Encoding categorical variables...")
-    label_encoders = {}
-    for col in ['state', 'district', 'market', 'commodity']:
-        le = LabelEncoder()
-        avg_price[col] = le.fit_transform(avg_price[col].astype(str))
-        label_encoders[col] = le
-    
-    # 4️⃣ Prepare scaler for environmental features
-    numeric_cols = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
-    
+    crop_suitable = augment_suitability_data(crop_suitable_raw.copy(), crop_price, min_samples=AUGMENT_MIN_SAMPLES)
+
     scaler = StandardScaler()
-    X_suit_raw = crop_suitable[numeric_cols].astype(float)
-    X_suit_scaled = scaler.fit_transform(X_suit_raw)
-    
-    # 5️⃣ Train SUITABILITY MODEL (Random Forest Classifier)
-    print("\n🌱 Training Suitability Model (Random Forest Classifier)...")
-    
+    X_suit_scaled = scaler.fit_transform(crop_suitable[NUMERIC_COLS].astype(float))
     le_crop = LabelEncoder()
     y_suit = le_crop.fit_transform(crop_suitable['label'].astype(str))
-    
+    return {'scaler': scaler, 'crop_encoder': le_crop, 'X': X_suit_scaled, 'y': y_suit}
+
+
+def suitability_data_key(cache, suitable_digest, crop_price):
+    # Augmentation only reads the commodity names from the price file, so new
+    # prices for the same crops leave every suitability stage cached
+    commodities = sorted(crop_price['Commodity'].astype(str).unique())
+    return cache.key('suitability_data', suitable_digest, commodities, AUGMENT_MIN_SAMPLES, NUMERIC_COLS)
+
+
+def price_data_key(cache, price_digest):
+    return cache.key('price_data', price_digest)
+
+
+def train_suitability_branch(crop_suitable_raw, crop_price, suitable_digest, cache, profiler, stages,
+                             distill=True, n_jobs=1):
+    """Augment, scale, fit and cross-validate the suitability classifier on n_jobs cores, then distil it"""
+    data_key = suitability_data_key(cache, suitable_digest, crop_price)
+    data = run_stage(cache, profiler, stages, 'suitability_data', data_key,
+                     lambda: prepare_suitability_data(crop_suitable_raw, crop_price))
+    X_suit_scaled, y_suit = data['X'], data['y']
+
     # Verify all classes have >= 2 samples
     unique, counts = np.unique(y_suit, return_counts=True)
     min_count = counts.min()
     print(f"   Minimum samples per class: {min_count}")
-    
+
     if min_count < 2:
         raise ValueError(f"Still have classes with < 2 samples after augmentation")
-    
+
     # Split with stratification
     X_train_s, X_test_s, y_train_s, y_test_s = train_test_split(
         X_suit_scaled, y_suit, 
@@ -239,86 +497,238 @@ def train_model():
         random_state=42, 
         stratify=y_suit
     )
-    
-    # Train Random Forest
-    suit_model = RandomForestClassifier(
-        n_estimators=200,
-        max_depth=20,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        class_weight='balanced',
-        random_state=42,
-        n_jobs=-1
-    )
-    
-    suit_model.fit(X_train_s, y_train_s)
-    
-    # Evaluate
-    y_pred_suit = suit_model.predict(X_test_s)
-    suit_accuracy = accuracy_score(y_test_s, y_pred_suit)
-    print(f"   ✅ Test Accuracy: {suit_accuracy:.4f}")
-    
-    # Cross-validation
+
+    def fit():
+        print("\n🌱 Training Suitability Model (Random Forest Classifier)...")
+        suit_model = make_suitability_model(n_jobs=n_jobs)
+        suit_model.fit(X_train_s, y_train_s)
+        return {'model': suit_model, 'accuracy': accuracy_score(y_test_s, suit_model.predict(X_test_s))}
+
+    model_key = cache.key(data_key, SUITABILITY_PARAMS)
+    fitted = run_stage(cache, profiler, stages, 'suitability_model', model_key, fit)
+    suit_model = fitted['model']
+    print(f"   ✅ Test Accuracy: {fitted['accuracy']:.4f}")
+
+    # Cross-validation: folds run in parallel on this branch's cores, each forest single-threaded
     cv_folds = min(3, min_count)
-    cv_scores = cross_val_score(suit_model, X_suit_scaled, y_suit, cv=cv_folds, scoring='accuracy')
+    cv_scores = run_stage(
+        cache, profiler, stages, 'suitability_cv', cache.key(data_key, SUITABILITY_PARAMS, int(cv_folds)),
+        lambda: cross_val_score(make_suitability_model(n_jobs=1), X_suit_scaled, y_suit, cv=cv_folds,
+                                scoring='accuracy', n_jobs=min(int(cv_folds), n_jobs))
+    )
     print(f"   ✅ Cross-Validation Accuracy: {cv_scores.mean():.4f} (+/- {cv_scores.std():.4f})")
-    
+
+    # Lightweight student that mimics the forest, checked on the held-out split
+    distilled, distillation = None, None
+    if distill:
+        print("\n🧪 Distilling suitability model...")
+        # Only the stats are cached; the accepted sub-forest shares the teacher's trees
+        distillation = run_stage(
+            cache, profiler, stages, 'suitability_distilled', cache.key(model_key, DISTILL_PARAMS),
+            lambda: distill_suitability_model(suit_model, X_test_s, **DISTILL_PARAMS)[1]
+        )
+        if distillation['accepted']:
+            distilled = subforest(suit_model, distillation['accepted']['n_estimators'])
+        best = distillation['accepted'] or min(distillation['candidates'], key=lambda c: c['percentile_max_error'])
+        verdict = "✅ Accepted" if distilled is not None else "⚠️  Rejected"
+        print(f"   {verdict}: {best['n_estimators']} trees, top-1 agreement {best['top1_agreement']:.3f}, "
+              f"teacher top-1 in top 3 {best['top3_agreement']:.3f}, "
+              f"p{distillation['error_percentile']} max error {best['percentile_max_error']:.3f}, "
+              f"{best['nodes']} nodes vs {distillation['teacher_nodes']}")
+
     # Feature importance
     feature_importance = pd.DataFrame({
-        'feature': numeric_cols,
+        'feature': NUMERIC_COLS,
         'importance': suit_model.feature_importances_
     }).sort_values('importance', ascending=False)
-    
+
     print("\n📊 Feature Importance (Suitability):")
     for idx, row in feature_importance.iterrows():
         print(f"   • {row['feature']}: {row['importance']:.4f}")
-    
-    # 6️⃣ Train PRICE PREDICTION MODEL (Ensemble)
-    print("\n💰 Training Price Prediction Model (Ensemble)...")
-    
+
+    return {
+        'scaler': data['scaler'],
+        'suitability_model': suit_model,
+        'crop_encoder': data['crop_encoder'],
+        'feature_importance': feature_importance,
+        'suitability_model_distilled': distilled,
+        'distillation': distillation,
+        'X': X_suit_scaled,
+    }
+
+
+def prepare_price_data(crop_price):
+    """Clean and label-encode the price data; also builds the location rollups"""
+    # Clean column names in price data (copy: the suitability branch reads the original)
+    print("\n🧹 Processing price data...")
+    crop_price = crop_price.rename(columns={
+        'State': 'state',
+        'District': 'district',
+        'Market': 'market',
+        'Commodity': 'commodity',
+        'Modal_x0020_Price': 'price'
+    })
+
+    crop_price = crop_price.dropna(subset=['price'])
+    crop_price['price'] = pd.to_numeric(crop_price['price'], errors='coerce')
+    crop_price = crop_price.dropna(subset=['price'])
+
+    # Same names as the price/location indexes serve (some markets carry trailing spaces)
+    for col in ['state', 'district', 'market', 'commodity']:
+        crop_price[col] = crop_price[col].astype(str).str.strip()
+
+    # Average price per crop
+    avg_price = crop_price.groupby(['state', 'district', 'market', 'commodity'])['price'].mean().reset_index()
+    avg_prices_by_crop = crop_price.groupby('commodity')['price'].mean().to_dict()
+
+    # Encode categorical columns for price model
+    print("🔢 Encoding categorical variables...")
+    label_encoders = {}
+    for col in ['state', 'district', 'market', 'commodity']:
+        le = LabelEncoder()
+        avg_price[col] = le.fit_transform(avg_price[col].astype(str))
+        label_encoders[col] = le
+
+    # Rollup aggregates for location fallback (market -> district -> state -> national)
+    print("📚 Building price rollups...")
+    price_rollups = build_price_rollups(crop_price, label_encoders)
+
+    return {
+        'avg_price': avg_price,
+        'avg_prices_by_crop': avg_prices_by_crop,
+        'label_encoders': label_encoders,
+        'price_rollups': price_rollups,
+    }
+
+
+def train_price_branch(crop_price, price_digest, cache, profiler, stages, n_jobs=1):
+    """Prepare price data and fit the price ensemble on n_jobs cores"""
+    data_key = price_data_key(cache, price_digest)
+    data = run_stage(cache, profiler, stages, 'price_data', data_key, lambda: prepare_price_data(crop_price))
+    avg_price = data['avg_price']
     X_price = avg_price[['state', 'district', 'market', 'commodity']].values
     y_price = avg_price['price'].values
-    
-    X_train_p, X_test_p, y_train_p, y_test_p = train_test_split(
-        X_price, y_price, test_size=0.2, random_state=42
-    )
-    
-    rf_price = RandomForestRegressor(n_estimators=100, max_depth=15, random_state=42, n_jobs=-1)
-    gb_price = GradientBoostingRegressor(n_estimators=100, max_depth=5, learning_rate=0.1, random_state=42)
-    ridge_price = Ridge(alpha=1.0)
-    
-    price_model = VotingRegressor(estimators=[('rf', rf_price), ('gb', gb_price), ('ridge', ridge_price)])
-    price_model.fit(X_train_p, y_train_p)
-    
-    # Evaluate
-    y_pred_price = price_model.predict(X_test_p)
-    mae = mean_absolute_error(y_test_p, y_pred_price)
-    r2 = r2_score(y_test_p, y_pred_price)
-    
-    print(f"   ✅ Mean Absolute Error: ₹{mae:.2f}")
-    print(f"   ✅ R² Score: {r2:.4f}")
-    
-    # 7️⃣ Save models
+
+    def fit():
+        print("\n💰 Training Price Prediction Model (Ensemble)...")
+        X_train_p, X_test_p, y_train_p, y_test_p = train_test_split(
+            X_price, y_price, test_size=0.2, random_state=42
+        )
+        price_model = make_price_model(n_jobs=n_jobs)
+        price_model.fit(X_train_p, y_train_p)
+
+        y_pred_price = price_model.predict(X_test_p)
+        return {
+            'model': price_model,
+            'mae': mean_absolute_error(y_test_p, y_pred_price),
+            'r2': r2_score(y_test_p, y_pred_price),
+        }
+
+    fitted = run_stage(cache, profiler, stages, 'price_model', cache.key(data_key, PRICE_MODEL_PARAMS), fit)
+    print(f"   ✅ Mean Absolute Error: ₹{fitted['mae']:.2f}")
+    print(f"   ✅ R² Score: {fitted['r2']:.4f}")
+
+    return {
+        'label_encoders': data['label_encoders'],
+        'price_model': fitted['model'],
+        'avg_prices_by_crop': data['avg_prices_by_crop'],
+        'price_rollups': data['price_rollups'],
+        'X': X_price,
+    }
+
+
+def train_model(models_path="all_models.pkl", report_path="training_report.json",
+                price_csv="crop_price.csv", suitable_csv="crop_suitable.csv",
+                cache_dir=TRAINING_CACHE_DIR, distill=True, compact_path="all_models.compact.pkl"):
+    """
+    Train both models and save them to `models_path`. Stage outputs are
+    cached in `cache_dir` keyed on input content and hyperparameters;
+    pass cache_dir=None to retrain everything. With `distill`, a small
+    stand-in for the suitability forest is also saved if it passes the
+    DISTILL_PARAMS checks. Unless `compact_path` is None, a compact copy
+    of the bundle is written there as well. A `<models_path>.run.json`
+    sidecar names the run, so loaders can match the two without hashing.
+    """
+    print("=" * 60)
+    print("🌾 CROP RECOMMENDATION MODEL TRAINING")
+    print("=" * 60)
+
+    profiler = StageProfiler()
+    cache = TrainingCache(cache_dir)
+    stages = {}
+    run_id = uuid.uuid4().hex
+
+    # 1️⃣ Load datasets
+    print("\n📂 Loading datasets...")
+    with profiler.stage("load_datasets"):
+        crop_price = pd.read_csv(price_csv)
+        crop_suitable_raw = pd.read_csv(suitable_csv)
+        price_digest = file_digest(price_csv)
+        suitable_digest = file_digest(suitable_csv)
+
+    # 2️⃣ Suitability and price branches share no state; train them concurrently.
+    # Each gets its own share of the cores so their estimators do not oversubscribe the machine.
+    # Output from the two branches may interleave.
+    suit_jobs, price_jobs = branch_jobs()
+    print(f"\n🧵 Cores: {suit_jobs} suitability, {price_jobs} price")
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="train") as pool:
+        suit_future = pool.submit(train_suitability_branch, crop_suitable_raw, crop_price, suitable_digest,
+                                  cache, profiler, stages, distill, suit_jobs)
+        price_future = pool.submit(train_price_branch, crop_price, price_digest, cache, profiler, stages,
+                                   price_jobs)
+        suit = suit_future.result()
+        price = price_future.result()
+
+    # 3️⃣ Save models; a compact copy from an earlier run must not outlive the bundle it was made from
     print("\n💾 Saving models...")
-    
-    joblib.dump({
-        'scaler': scaler,
-        'label_encoders': label_encoders,
-        'numeric_cols': numeric_cols,
-        'suitability_model': suit_model,
-        'crop_encoder': le_crop,
-        'price_model': price_model,
-        'avg_prices_by_crop': avg_prices_by_crop,
-        'feature_importance': feature_importance,
-        'valid_crops': le_crop.classes_.tolist()
-    }, "all_models.pkl")
-    
-    print("   ✅ Models saved to 'all_models.pkl'")
+    if compact_path and os.path.exists(compact_path):
+        os.remove(compact_path)
+    with profiler.stage("save_models"):
+        bundle = {
+            'scaler': suit['scaler'],
+            'label_encoders': price['label_encoders'],
+            'numeric_cols': NUMERIC_COLS,
+            'suitability_model': suit['suitability_model'],
+            'crop_encoder': suit['crop_encoder'],
+            'price_model': price['price_model'],
+            'avg_prices_by_crop': price['avg_prices_by_crop'],
+            'price_rollups': price['price_rollups'],
+            'suitability_model_distilled': suit['suitability_model_distilled'],
+            'distillation': suit['distillation'],
+            'feature_importance': suit['feature_importance'],
+            'valid_crops': suit['crop_encoder'].classes_.tolist(),
+            'training_stages': stages,
+            'training_run': run_id,
+        }
+        joblib.dump(bundle, models_path)
+        stamp = write_run_record(models_path, run_id)
+    print(f"   ✅ Models saved to '{models_path}'")
+
+    if compact_path:
+        with profiler.stage("save_compact_models"):
+            check = save_compact_models(bundle, compact_path, suit['X'], price['X'],
+                                        source_run=run_id, source_stamp=stamp)
+        print(f"   ✅ Compact models saved to '{compact_path}' "
+              f"({os.path.getsize(compact_path) / 2**20:.1f} MB vs {os.path.getsize(models_path) / 2**20:.1f} MB, "
+              f"max suitability error {check['suitability_max_error']:.1e})")
+
+    cached = [name for name, stage in stages.items() if stage['cached']]
+    print(f"   ♻️  {len(cached)}/{len(stages)} stages reused from cache"
+          + (f": {', '.join(cached)}" if cached else ""))
+
+    report = profiler.write(report_path)
+    memory = (f"{report['traced_peak_memory_mb']:.0f} MB traced peak" if report['traced_peak_memory_mb'] is not None
+              else f"{report['max_rss_mb']:.0f} MB max RSS" if report['max_rss_mb'] is not None
+              else "memory not measured")
+    print(f"   ✅ Training report saved to '{report_path}' "
+          f"({report['total_wall_seconds']:.1f}s wall, {report['total_cpu_seconds']:.1f}s CPU, {memory})")
+
     print("\n" + "=" * 60)
     print("✅ TRAINING COMPLETE!")
     print("=" * 60)
-    
-    return price_model, suit_model, scaler, label_encoders, le_crop, avg_prices_by_crop
+
+    return (price['price_model'], suit['suitability_model'], suit['scaler'],
+            price['label_encoders'], suit['crop_encoder'], price['avg_prices_by_crop'])
 
 
 def recommend_crops(user_input, models_dict, top_k=3, price_weight=0.6, suit_weight=0.4):
@@ -0,0 +1,230 @@
+# model_registry.py
+import bisect
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+ROUTING_MODES = ("shadow", "split")
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; percentiles are bucket upper bounds"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+            self.count += 1
+            self.total_ms += ms
+
+    def percentile(self, q: float):
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {
+                (f"le_{b}" if i < len(self.buckets) else "inf"): n
+                for i, (b, n) in enumerate(zip(self.buckets + (None,), self.counts))
+            },
+        }
+
+
+class ModelVersion:
+    """One loaded, ready-to-serve model bundle with its own latency and agreement stats"""
+
+    def __init__(self, name: str, models: dict, source: Optional[str] = None):
+        self.name = name
+        self.models = models
+        self.source = source
+        self.loaded_at = time.time()
+        self.latency = {"served": LatencyHistogram(), "shadow": LatencyHistogram()}
+        self.agreement = {"compared": 0, "top1_agree": 0, "top3_overlap": 0.0}
+        self._lock = threading.Lock()
+
+    def record_agreement(self, top1_agree: bool, top3_overlap: float):
+        with self._lock:
+            self.agreement["compared"] += 1
+            self.agreement["top1_agree"] += int(top1_agree)
+            self.agreement["top3_overlap"] += top3_overlap
+
+    def snapshot(self) -> dict:
+        compared = self.agreement["compared"]
+        return {
+            "name": self.name,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "latency": {role: h.snapshot() for role, h in self.latency.items()},
+            "agreement": {
+                "compared": compared,
+                "top1_rate": round(self.agreement["top1_agree"] / compared, 4) if compared else None,
+                "top3_overlap": round(self.agreement["top3_overlap"] / compared, 4) if compared else None,
+            },
+        }
+
+
+class ModelRegistry:
+    """
+    Several loaded model versions, one active and at most one candidate.
+
+    A `candidate_fraction` of requests involve the candidate. In "shadow"
+    mode the active version still answers and the candidate is scored on a
+    background thread for comparison. In "split" mode the candidate answers
+    and the active version is shadow-scored instead. Shadow work goes
+    through a bounded queue and is dropped, never waited on, when it falls
+    behind. promote() and rollback() only move references.
+    """
+
+    def __init__(self, max_shadow_pending=100):
+        self.versions = {}
+        self.active: Optional[ModelVersion] = None
+        self.previous: Optional[ModelVersion] = None
+        self.candidate: Optional[ModelVersion] = None
+        self.candidate_fraction = 0.0
+        self.mode = "shadow"
+        self.max_shadow_pending = max_shadow_pending
+        self.shadow_stats = {"submitted": 0, "dropped": 0, "failed": 0}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+
+    def register(self, name: str, models: dict, source: Optional[str] = None,
+                 replace_active: bool = False) -> ModelVersion:
+        """
+        Add a version; re-registering a name replaces it, including as
+        candidate or rollback target. The active version is only replaced
+        (in place, keeping the rollback target) with replace_active.
+        """
+        existing = self.versions.get(name)
+        if existing is not None and existing is self.active and not replace_active:
+            raise ValueError(f"'{name}' is the active version")
+        version = ModelVersion(name, models, source)
+        self.versions[name] = version
+        if existing is not None:
+            if self.active is existing:
+                self.active = version
+            if self.candidate is existing:
+                self.candidate = version
+            if self.previous is existing:
+                self.previous = version
+        if self.active is None:
+            self.active = version
+        return version
+
+    def unregister(self, name: str) -> ModelVersion:
+        """Drop a version that is neither active nor candidate; it stops being the rollback target"""
+        version = self.get(name)
+        if version is self.active:
+            raise ValueError(f"'{name}' is the active version")
+        if version is self.candidate:
+            raise ValueError(f"'{name}' is the candidate version")
+        if self.previous is version:
+            self.previous = None
+        del self.versions[name]
+        return version
+
+    def get(self, name: str) -> ModelVersion:
+        if name not in self.versions:
+            raise KeyError(f"Unknown model version '{name}'")
+        return self.versions[name]
+
+    def set_candidate(self, name: Optional[str], fraction: float = 0.0, mode: str = "shadow"):
+        if mode not in ROUTING_MODES:
+            raise ValueError(f"Invalid mode. Must be one of: {', '.join(ROUTING_MODES)}")
+        if not 0.0 <= fraction <= 1.0:
+            raise ValueError("fraction must be between 0 and 1")
+        candidate = self.get(name) if name else None
+        if candidate is not None and candidate is self.active:
+            raise ValueError(f"'{name}' is already the active version")
+        self.candidate, self.candidate_fraction, self.mode = candidate, fraction, mode
+
+    def promote(self, name: Optional[str] = None) -> ModelVersion:
+        """Make `name` (default: the candidate) active; the old active becomes the rollback target"""
+        version = self.get(name) if name else self.candidate
+        if version is None:
+            raise ValueError("No candidate to promote")
+        if version is self.active:
+            raise ValueError(f"'{version.name}' is already the active version")
+        self.previous, self.active = self.active, version
+        if self.candidate is version:
+            self.candidate = None
+        return version
+
+    def rollback(self) -> ModelVersion:
+        if self.previous is None:
+            raise ValueError("Nothing to roll back to")
+        self.active, self.previous = self.previous, self.active
+        return self.active
+
+    def route(self):
+        """(version that answers, version to shadow-score or None) for one request"""
+        active, candidate = self.active, self.candidate
+        if candidate is None or random.random() >= self.candidate_fraction:
+            return active, None
+        if self.mode == "split":
+            return candidate, active
+        return active, candidate
+
+    def submit_shadow(self, fn) -> bool:
+        """Run fn() on the shadow thread unless too much shadow work is already queued"""
+        with self._lock:
+            if self._pending >= self.max_shadow_pending:
+                self.shadow_stats["dropped"] += 1
+                return False
+            self._pending += 1
+            self.shadow_stats["submitted"] += 1
+        self._executor.submit(self._run_shadow, fn)
+        return True
+
+    def _run_shadow(self, fn):
+        try:
+            fn()
+        except Exception as e:
+            self.shadow_stats["failed"] += 1
+            logger.warning("Shadow scoring failed: %s", e)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def close(self):
+        """Drop queued shadow work; a fresh executor keeps the registry usable if the app starts again"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+
+    def snapshot(self) -> dict:
+        return {
+            "active": self.active.name if self.active else None,
+            "previous": self.previous.name if self.previous else None,
+            "candidate": self.candidate.name if self.candidate else None,
+            "candidate_fraction": self.candidate_fraction,
+            "mode": self.mode,
+            "shadow": {**self.shadow_stats, "pending": self._pending},
+            "versions": {name: v.snapshot() for name, v in self.versions.items()},
+        }
@@ -0,0 +1,149 @@
+# price_index.py
+import hashlib
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+PRICE_CSV_PATH = Path(__file__).resolve().parent / "crop_price.csv"
+
+# CSV header -> API field name
+PRICE_COLUMNS = {
+    'State': 'state',
+    'District': 'district',
+    'Market': 'market',
+    'Commodity': 'commodity',
+    'Variety': 'variety',
+    'Grade': 'grade',
+    'Arrival_Date': 'arrival_date',
+    'Min_x0020_Price': 'min_price',
+    'Max_x0020_Price': 'max_price',
+    'Modal_x0020_Price': 'modal_price',
+}
+
+FILTER_FIELDS = ('state', 'district', 'market', 'commodity')
+SORT_FIELDS = ('state', 'district', 'market', 'commodity', 'arrival_date',
+               'min_price', 'max_price', 'modal_price')
+
+
+def normalize_key(value: str) -> str:
+    """Normalize a location/commodity name for case-insensitive lookups"""
+    return str(value).strip().lower()
+
+
+class PriceIndex:
+    """
+    In-memory index over crop_price.csv.
+
+    Rows are kept in a list of plain dicts (ready for JSON). Each filter field
+    has a posting list (value -> sorted row ids) and each sort field has a
+    precomputed rank array, so a query only touches the rows it returns.
+    """
+
+    def __init__(self, df: pd.DataFrame, version: str):
+        df = df.rename(columns=PRICE_COLUMNS)[list(PRICE_COLUMNS.values())].reset_index(drop=True)
+        for col in FILTER_FIELDS + ('variety', 'grade', 'arrival_date'):
+            df[col] = df[col].astype(str).str.strip()
+        for col in ('min_price', 'max_price', 'modal_price'):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+        self.version = version
+        self.size = len(df)
+        self.records = [
+            {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in row.items()}
+            for row in df.astype(object).to_dict('records')
+        ]
+
+        # value -> row ids (ascending) for every filter field
+        self._postings = {}
+        for col in FILTER_FIELDS:
+            keys = df[col].map(normalize_key)
+            self._postings[col] = {
+                key: np.asarray(ids, dtype=np.int32)
+                for key, ids in keys.groupby(keys, sort=False).indices.items()
+            }
+
+        # rank[row] = position of the row in the global order of the field
+        self._ranks = {}
+        for col in SORT_FIELDS:
+            if col == 'arrival_date':
+                values = pd.to_datetime(df[col], format='%d-%m-%Y', errors='coerce')
+            elif col.endswith('_price'):
+                values = df[col]
+            else:
+                values = df[col].str.lower()
+            order = values.sort_values(kind='stable', na_position='last').index.to_numpy()
+            rank = np.empty(self.size, dtype=np.int32)
+            rank[order] = np.arange(self.size, dtype=np.int32)
+            self._ranks[col] = rank
+
+    @classmethod
+    def from_csv(cls, path=PRICE_CSV_PATH):
+        """Build the index from a price CSV; the version is the file's content hash"""
+        raw = Path(path).read_bytes()
+        version = hashlib.sha1(raw).hexdigest()[:16]
+        df = pd.read_csv(path)
+        return cls(df, version)
+
+    def _match(self, filters: dict) -> np.ndarray:
+        """Intersect posting lists of all given filters, smallest first"""
+        postings = []
+        for field in FILTER_FIELDS:
+            value = filters.get(field)
+            if value:
+                ids = self._postings[field].get(normalize_key(value))
+                if ids is None:
+                    return np.empty(0, dtype=np.int32)
+                postings.append(ids)
+
+        if not postings:
+            return np.arange(self.size, dtype=np.int32)
+
+        postings.sort(key=len)
+        matched = postings[0]
+        for ids in postings[1:]:
+            matched = np.intersect1d(matched, ids, assume_unique=True)
+            if matched.size == 0:
+                break
+        return matched
+
+    def query(self, state: Optional[str] = None, district: Optional[str] = None,
+              market: Optional[str] = None, commodity: Optional[str] = None,
+              sort_by: Optional[str] = None, order: str = 'asc',
+              offset: int = 0, limit: int = 50) -> dict:
+        """Filter, sort and paginate price records"""
+        if sort_by is not None and sort_by not in SORT_FIELDS:
+            raise ValueError(f"Invalid sort field. Must be one of: {', '.join(SORT_FIELDS)}")
+        if order not in ('asc', 'desc'):
+            raise ValueError("Invalid order. Must be 'asc' or 'desc'")
+
+        matched = self._match({
+            'state': state, 'district': district,
+            'market': market, 'commodity': commodity,
+        })
+
+        if sort_by is not None and matched.size:
+            ranks = self._ranks[sort_by][matched]
+            if order == 'desc':
+                ranks = -ranks
+            matched = matched[np.argsort(ranks, kind='stable')]
+
+        page = matched[offset:offset + limit]
+        return {
+            "total": int(matched.size),
+            "offset": offset,
+            "limit": limit,
+            "items": [self.records[i] for i in page],
+        }
+
+    def etag(self, params: dict) -> str:
+        """Strong ETag for a query: dataset version + normalized parameters"""
+        canonical = json.dumps(
+            {k: (normalize_key(v) if k in FILTER_FIELDS and v else v) for k, v in sorted(params.items())},
+            separators=(',', ':'), default=str
+        )
+        digest = hashlib.sha1(f"{self.version}:{canonical}".encode()).hexdigest()[:20]
+        return f'"{digest}"'
@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import main  # noqa: E402
+
+
+requires_models = pytest.mark.skipif(
+    not (main.MODEL_PATH.exists() or main.COMPACT_MODEL_PATH.exists()),
+    reason="trained model files not found; run ml_model_tf.py first",
+)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """API client with models loaded and history writing disabled"""
+    from fastapi.testclient import TestClient
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "HISTORY_ENABLED", False)
+        with TestClient(main.app) as c:
+            yield c
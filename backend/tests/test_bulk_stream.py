@@ -0,0 +1,52 @@
+import io
+import json
+
+import main
+from conftest import requires_models
+
+HEADER = b"soil_type,season,state,district,market\r\n"
+VALID = b"Loamy,Kharif,Punjab,Ludhiana,Ludhiana\r\n"
+
+
+def _records(body: str) -> list:
+    return [json.loads(line) for line in body.splitlines()]
+
+
+@requires_models
+def test_unreadable_rows_do_not_stop_the_run(client):
+    oversized = b"Loamy,Kharif,Punjab,Ludhiana," + b"x" * 200_000 + b"\r\n"
+    bad_byte = b"Clay,Rabi,Punjab,Ludhiana,Lu\xffdhiana\r\n"
+    upload = HEADER + VALID + oversized + bad_byte + VALID + VALID
+
+    response = client.post("/bulk/score?chunk_size=2",
+                           files={"file": ("farmers.csv", upload, "text/csv")})
+    assert response.status_code == 200
+    records = _records(response.text)
+
+    assert [r["row"] for r in records] == [1, 2, 3, 4, 5]
+    assert [r["status"] for r in records] == ["ok", "error", "error", "ok", "ok"]
+    assert "field larger than field limit" in records[1]["error"]
+    assert "not valid UTF-8" in records[2]["error"]
+
+    job = client.get(f"/bulk/jobs/{response.headers['X-Job-Id']}").json()
+    assert (job["status"], job["rows_ok"], job["rows_failed"]) == ("completed", 3, 2)
+
+
+@requires_models
+def test_bad_header_is_rejected(client):
+    response = client.post("/bulk/score", files={"file": ("farmers.csv", b"soil_type,season\r\n" + VALID)})
+    assert response.status_code == 400
+    assert "missing column" in response.json()["detail"]
+
+
+@requires_models
+def test_closed_stream_marks_job_cancelled(client):
+    job = main.new_bulk_job("<test>")
+    rows = main.open_bulk_reader(io.BytesIO(HEADER + VALID * 10))
+    stream = main.stream_bulk_scores(rows, chunk_size=2, job=job)
+
+    next(stream)
+    stream.close()
+    assert job["status"] == "cancelled"
+    assert job["rows_processed"] == 2
+    assert job["finished_at"] is not None
@@ -0,0 +1,53 @@
+import joblib
+import pytest
+
+import main
+from ml_model_tf import write_run_record
+
+
+@pytest.fixture
+def bundle_paths(tmp_path, monkeypatch):
+    models_path = tmp_path / "all_models.pkl"
+    compact_path = tmp_path / "all_models.compact.pkl"
+    monkeypatch.setattr(main, "MODEL_PATH", models_path)
+    monkeypatch.setattr(main, "COMPACT_MODEL_PATH", compact_path)
+    monkeypatch.setattr(main, "MODEL_FORMAT", "compact")
+    return models_path, compact_path
+
+
+def _save(models_path, compact_path, run_id):
+    joblib.dump({'kind': 'full', 'run': run_id}, models_path)
+    stamp = write_run_record(models_path, run_id)
+    joblib.dump({'kind': 'compact', 'compact': {'source_run': run_id, 'source_stamp': stamp}}, compact_path)
+
+
+def test_compact_from_same_run_is_loaded(bundle_paths):
+    _save(*bundle_paths, "run-1")
+    bundle, path = main.load_model_bundle()
+    assert (bundle['kind'], path) == ('compact', bundle_paths[1])
+
+
+def test_compact_alone_is_loaded(bundle_paths):
+    models_path, compact_path = bundle_paths
+    _save(models_path, compact_path, "run-1")
+    models_path.unlink()
+    assert main.load_model_bundle()[0]['kind'] == 'compact'
+
+
+def test_compact_from_earlier_run_is_skipped(bundle_paths):
+    models_path, compact_path = bundle_paths
+    _save(models_path, compact_path, "run-1")
+    stale = joblib.load(compact_path)
+    _save(models_path, compact_path, "run-2")
+    joblib.dump(stale, compact_path)
+    assert main.load_model_bundle()[0]['kind'] == 'full'
+
+
+def test_replaced_bundle_without_sidecar_is_detected_by_stamp(bundle_paths):
+    models_path, compact_path = bundle_paths
+    _save(models_path, compact_path, "run-1")
+    models_path.with_name("all_models.pkl.run.json").unlink()
+    assert main.load_model_bundle()[0]['kind'] == 'compact'
+
+    joblib.dump({'kind': 'full', 'run': 'copied-in', 'padding': 'x' * 100}, models_path)
+    assert main.load_model_bundle()[0]['kind'] == 'full'
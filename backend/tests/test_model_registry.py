@@ -0,0 +1,78 @@
+import joblib
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.preprocessing import LabelEncoder
+
+import main
+from conftest import requires_models
+from model_registry import ModelRegistry
+
+FARMER = {"soil_type": "Loamy", "season": "Kharif", "state": "Punjab", "district": "Ludhiana", "market": "Ludhiana"}
+ADMIN = {"X-Admin-Token": "test-token"}
+
+
+def test_unregister_refuses_active_and_candidate():
+    registry = ModelRegistry()
+    registry.register("a", {})
+    registry.register("b", {})
+    registry.register("c", {})
+    registry.set_candidate("b", 0.1)
+    registry.promote("c")
+
+    for name in ("b", "c"):
+        with pytest.raises(ValueError):
+            registry.unregister(name)
+    registry.unregister("a")
+    assert registry.previous is None
+    assert set(registry.versions) == {"b", "c"}
+
+
+def test_register_replaces_active_only_when_asked():
+    registry = ModelRegistry()
+    registry.register("a", {})
+    registry.register("b", {})
+    registry.promote("b")
+    with pytest.raises(ValueError):
+        registry.register("b", {})
+
+    replaced = registry.register("b", {"new": True}, replace_active=True)
+    assert registry.active is replaced
+    assert registry.previous.name == "a"
+
+
+@requires_models
+def test_app_starts_twice_in_one_process(monkeypatch):
+    monkeypatch.setattr(main, "HISTORY_ENABLED", False)
+    for _ in range(2):
+        with TestClient(main.app) as c:
+            assert c.post("/predict", json=FARMER).status_code == 200
+            assert main.model_load_error is None
+
+
+@requires_models
+def test_promoted_bundle_drives_location_resolution(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "HISTORY_ENABLED", False)
+    monkeypatch.setattr(main, "ADMIN_TOKEN", ADMIN["X-Admin-Token"])
+    monkeypatch.setattr(main, "MODELS_DIR", tmp_path.resolve())
+
+    path = main.COMPACT_MODEL_PATH if main.COMPACT_MODEL_PATH.exists() else main.MODEL_PATH
+    bundle = joblib.load(path)
+    markets = [m for m in bundle['label_encoders']['market'].classes_ if m != "Ludhiana"]
+    bundle['label_encoders'] = {**bundle['label_encoders'], 'market': LabelEncoder().fit(markets)}
+    joblib.dump(bundle, tmp_path / "no_ludhiana.pkl")
+
+    with TestClient(main.app) as c:
+        assert main.location_index.resolve("punjab", "ludhiana", "ludhiana")['market'] == "Ludhiana"
+
+        assert c.post("/models/load", json={"name": "v2", "bundle": "no_ludhiana.pkl"},
+                      headers=ADMIN).status_code == 200
+        assert c.post("/models/promote?name=v2", headers=ADMIN).status_code == 200
+        assert main.location_index.resolve("punjab", "ludhiana", "ludhiana")['market'] is None
+        assert c.post("/predict", json=FARMER).status_code == 200
+
+        assert c.delete("/models/v2", headers=ADMIN).status_code == 400
+        assert c.post("/models/rollback", headers=ADMIN).status_code == 200
+        assert main.location_index.resolve("punjab", "ludhiana", "ludhiana")['market'] == "Ludhiana"
+
+        assert c.delete("/models/v2", headers=ADMIN).status_code == 200
+        assert "v2" not in c.get("/models", headers=ADMIN).json()["versions"]
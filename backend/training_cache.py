@@ -0,0 +1,89 @@
+# training_cache.py
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import joblib
+import sklearn
+
+
+TRAINING_CACHE_DIR = Path(__file__).resolve().parent / ".training_cache"
+
+# Bump when a stage's output format or computation changes
+CACHE_FORMAT = 3
+
+
+def fingerprint(*parts) -> str:
+    """Stable digest of JSON-serializable values and raw bytes"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else json.dumps(part, sort_keys=True, default=str).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()[:20]
+
+
+def file_digest(path) -> str:
+    """Content hash of a file, independent of its name and mtime"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:20]
+
+
+def file_stamp(path) -> dict:
+    """Size and modification time of a file: a check that it was not replaced, without reading it"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class TrainingCache:
+    """
+    Content-addressed store for training stage outputs.
+
+    Each entry lives at <dir>/<stage>-<key>.joblib, where the key is a
+    fingerprint of everything the stage depends on. Callers chain keys
+    (a stage's key includes its upstream stage's key), so a changed input
+    invalidates exactly the stages downstream of it. With `cache_dir=None`
+    every stage is recomputed and nothing is written.
+    """
+
+    def __init__(self, cache_dir=TRAINING_CACHE_DIR, keep_per_stage=3):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.keep_per_stage = keep_per_stage
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, *parts) -> str:
+        return fingerprint(CACHE_FORMAT, sklearn.__version__, *parts)
+
+    def _path(self, stage, key) -> Path:
+        return self.cache_dir / f"{stage}-{key}.joblib"
+
+    def get_or_compute(self, stage: str, key: str, compute):
+        """Return (value, cached); compute() runs only on a miss"""
+        if self.cache_dir is None:
+            return compute(), False
+
+        path = self._path(stage, key)
+        if path.exists():
+            try:
+                value = joblib.load(path)
+                os.utime(path)
+                return value, True
+            except Exception as e:
+                print(f"   ⚠️  Ignoring unreadable cache entry {path.name}: {e}")
+
+        value = compute()
+        tmp = path.with_suffix(".tmp")
+        joblib.dump(value, tmp)
+        tmp.replace(path)
+        self._prune(stage)
+        return value, False
+
+    def _prune(self, stage):
+        """Keep only the most recently used entries of a stage"""
+        entries = sorted(self.cache_dir.glob(f"{stage}-*.joblib"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for path in entries[self.keep_per_stage:]:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,136 @@
+# training_profiler.py
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Tracing every allocation roughly triples the time of the forest fits it
+# measures, so it is opt-in
+PROFILE_MEMORY = os.getenv("TRAINING_PROFILE_MEMORY") == "1"
+
+
+def max_rss_mb():
+    """Peak resident set size of this process in MB, or None where getrusage is unavailable"""
+    if resource is None:
+        return None
+    # ru_maxrss is bytes on macOS, KB on Linux
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(max_rss / 2**20 if sys.platform == "darwin" else max_rss / 1024, 2)
+
+
+class StageProfiler:
+    """
+    Record wall time, CPU time and memory per training stage.
+
+    By default each stage records the process's peak RSS when it ends: a
+    high-water mark for the run so far, free to collect. With trace_memory
+    (TRAINING_PROFILE_MEMORY=1) Python/NumPy allocations are also traced;
+    stages may run concurrently in different threads, so traced memory is
+    sampled by a background thread and attributed to every stage active at
+    that moment. CPU time is process-wide (all threads of this process)
+    over the stage's window; work done in joblib worker processes is not
+    included.
+    """
+
+    def __init__(self, sample_interval=0.01, trace_memory=PROFILE_MEMORY):
+        self.sample_interval = sample_interval
+        self.trace_memory = trace_memory
+        self.stages = []
+        self._active = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+
+        self._owns_tracemalloc = False
+        self._sampler = None
+        if trace_memory:
+            self._owns_tracemalloc = not tracemalloc.is_tracing()
+            if self._owns_tracemalloc:
+                tracemalloc.start()
+            self._sampler = threading.Thread(target=self._sample_loop, name="memory-sampler", daemon=True)
+            self._sampler.start()
+
+    def _sample(self):
+        current = tracemalloc.get_traced_memory()[0]
+        with self._lock:
+            for key, peak in self._active.items():
+                if current > peak:
+                    self._active[key] = current
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.sample_interval):
+            self._sample()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the block; fields set on the yielded dict are added to the stage record"""
+        extra = {}
+        key = (name, threading.get_ident())
+        if self.trace_memory:
+            with self._lock:
+                self._active[key] = tracemalloc.get_traced_memory()[0]
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield extra
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            record = {
+                "stage": name,
+                "thread": threading.current_thread().name,
+                "start_offset_seconds": round(wall_start - self._started, 3),
+                "wall_seconds": round(wall, 3),
+                "cpu_seconds": round(cpu, 3),
+                "max_rss_mb": max_rss_mb(),
+            }
+            if self.trace_memory:
+                self._sample()
+                with self._lock:
+                    record["peak_memory_mb"] = round(self._active.pop(key) / 2**20, 2)
+            with self._lock:
+                self.stages.append({**record, **extra})
+
+            if self.trace_memory:
+                memory = f"{record['peak_memory_mb']:.1f} MB peak"
+            elif record["max_rss_mb"] is not None:
+                memory = f"{record['max_rss_mb']:.0f} MB max RSS"
+            else:
+                memory = "memory not measured"
+            print(f"   ⏱️  {name}: {wall:.2f}s wall, {cpu:.2f}s CPU, {memory}")
+
+    def report(self) -> dict:
+        traced_peak = None
+        if self.trace_memory:
+            self._stop.set()
+            self._sampler.join()
+            traced_peak = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+
+        return {
+            "total_wall_seconds": round(time.perf_counter() - self._started, 3),
+            "total_cpu_seconds": round(time.process_time() - self._cpu_started, 3),
+            "traced_peak_memory_mb": traced_peak,
+            "max_rss_mb": max_rss_mb(),
+            "cpu_count": os.cpu_count(),
+            "memory_scope": ("main process; stage max_rss_mb is the process high-water mark at stage end"
+                             + ("; peak_memory_mb is Python/NumPy allocations traced by tracemalloc"
+                                if self.trace_memory else "")),
+            "stages": sorted(self.stages, key=lambda s: s["start_offset_seconds"]),
+        }
+
+    def write(self, path):
+        report = self.report()
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report